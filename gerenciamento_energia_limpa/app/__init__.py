@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from config.config import config
 
@@ -10,4 +11,12 @@ def create_app(config_name='default'):
     from app.views.routes import main as main_blueprint
     app.register_blueprint(main_blueprint)
     
+    # Manter as previsões de geração atualizadas em segundo plano. Com o
+    # reloader do modo debug, apenas o processo filho (que atende as
+    # requisições) inicia a thread
+    reloader_pai = app.debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+    if app.config.get('FORECAST_PREWARM', False) and not reloader_pai:
+        from app.controllers.generation_forecaster import GenerationForecaster
+        GenerationForecaster.start_prewarmer(app.config.get('FORECAST_PREWARM_INTERVAL'))
+    
     return app
\ No newline at end of file
@@ -1,13 +1,11 @@
-import os
-import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-# Importações condicionais para permitir execução mesmo sem todas as dependências
+# Importações condicionais e tardias (carregadas no primeiro uso) para permitir execução mesmo sem todas as dependências
+from app.importacao import importar_tardio
 try:
-    import pandas as pd
-    import matplotlib.pyplot as plt
-    import seaborn as sns
-    import numpy as np
+    pd = importar_tardio('pandas')
+    np = importar_tardio('numpy')
     PANDAS_AVAILABLE = True
 except ImportError:
     PANDAS_AVAILABLE = False
@@ -17,86 +15,131 @@ except ImportError:
             return None
     pd = MockPandas()
 
+from app.data_processors.columnar_store import ColumnarStore
+from app.data_processors.dataframe_cache import DataFrameCache
+from app.data_processors.downsampling import Downsampling
+from app.data_processors.rollups import Rollups, NS_POR_HORA
+from app.models.fonte_energia import FonteEnergiaRepository
+
 class DashboardController:
     """Controlador para processamento de dados do dashboard"""
     
+    # Menor max_pontos aceito na redução de séries (primeiro, último e um ponto intermediário)
+    MIN_PONTOS = 3
+    
     @staticmethod
-    def get_dados_fonte(fonte_id):
-        """Obtém todos os dados disponíveis para uma fonte específica"""
+    def get_dados_fonte(fonte_id, inicio=None, fim=None):
+        """
+        Obtém os dados disponíveis para uma fonte específica
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            inicio (datetime): Início do período (opcional)
+            fim (datetime): Fim do período (opcional)
+            
+        Returns:
+            DataFrame: Dados ordenados por data_hora ou None se não houver dados
+        """
         if not PANDAS_AVAILABLE:
             return None
-            
-        # Verificar arquivos de dados simulados
-        path_simulado = f'data/simulated/fonte_{fonte_id}_simulado.csv'
-        
-        # Verificar arquivos de dados processados
-        processed_files = []
-        processed_dir = 'data/processed'
-        if os.path.exists(processed_dir):
-            processed_files = [f for f in os.listdir(processed_dir) 
-                              if f.startswith(f'fonte_{fonte_id}_') and f.endswith('.csv')]
-        
-        # Lista para armazenar todos os dataframes
-        dfs = []
-        
-        # Carregar dados simulados se existirem
-        if os.path.exists(path_simulado):
-            df_simulado = pd.read_csv(path_simulado)
-            df_simulado['data_hora'] = pd.to_datetime(df_simulado['data_hora'])
-            dfs.append(df_simulado)
-        
-        # Carregar dados processados se existirem
-        for file in processed_files:
-            file_path = os.path.join(processed_dir, file)
-            df = pd.read_csv(file_path)
-            df['data_hora'] = pd.to_datetime(df['data_hora'])
-            dfs.append(df)
-        
-        # Combinar todos os dados
-        if dfs:
-            df_combined = pd.concat(dfs, ignore_index=True)
-            # Remover duplicações por data_hora (caso haja sobreposição)
-            df_combined = df_combined.drop_duplicates(subset=['data_hora'])
-            # Ordenar por data_hora
-            df_combined = df_combined.sort_values('data_hora')
-            return df_combined
-        else:
-            # Se não existirem dados, gerar dados simulados automaticamente
-            try:
-                from app.data_processors.data_importer import GrowattDataImporter
-                resultado = GrowattDataImporter.gerar_dados_simulados(fonte_id, dias=30)
-                if resultado['sucesso'] and os.path.exists(resultado['caminho_arquivo']):
-                    df_simulado = pd.read_csv(resultado['caminho_arquivo'])
-                    df_simulado['data_hora'] = pd.to_datetime(df_simulado['data_hora'])
-                    return df_simulado
-            except Exception as e:
-                print(f"Erro ao gerar dados simulados automaticamente: {str(e)}")
+        
+        # Dados simulados só são exibidos para fontes sem dados reais
+        simulado = not ColumnarStore.possui_dados(fonte_id)
+        
+        # Servir do cache se os dados da fonte não mudaram desde a última leitura
+        chave = (fonte_id, inicio, fim, simulado)
+        versao = ColumnarStore.versao(fonte_id)
+        df = DataFrameCache.obter(chave, versao)
+        if df is not None:
+            # Cópia rasa: os handlers apenas adicionam colunas ao DataFrame
+            return df.copy(deep=False)
+        
+        # Ler apenas as partições mensais do período solicitado
+        df = ColumnarStore.carregar(fonte_id, inicio, fim, simulado=simulado)
+        if df is not None:
+            DataFrameCache.armazenar(chave, versao, df)
+            return df.copy(deep=False)
+        
+        if ColumnarStore.possui_dados(fonte_id, simulado=simulado):
+            # Existem dados, mas nenhum no período solicitado
+            return None
+        
+        # Se não existirem dados, gerar dados simulados automaticamente
+        if DashboardController._gerar_dados_iniciais(fonte_id):
+            return ColumnarStore.carregar(fonte_id, inicio, fim, simulado=True)
                 
         return None
     
+    @staticmethod
+    def get_agregacao(fonte_id, nivel, inicio=None, fim=None):
+        """
+        Obtém a tabela de agregação diária ou horária de uma fonte
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            nivel (str): 'diario' ou 'horario'
+            inicio (datetime): Início do período (opcional)
+            fim (datetime): Fim do período (opcional)
+            
+        Returns:
+            DataFrame: Uma linha por dia/hora ou None se não houver dados
+        """
+        if not PANDAS_AVAILABLE:
+            return None
+        
+        # Dados simulados só são exibidos para fontes sem dados reais
+        simulado = not ColumnarStore.possui_dados(fonte_id)
+        
+        chave = (fonte_id, nivel, inicio, fim, simulado)
+        versao = ColumnarStore.versao(fonte_id)
+        df = DataFrameCache.obter(chave, versao)
+        if df is not None:
+            return df.copy(deep=False)
+        
+        if simulado and not ColumnarStore.possui_dados(fonte_id, simulado=True):
+            if not DashboardController._gerar_dados_iniciais(fonte_id):
+                return None
+            versao = ColumnarStore.versao(fonte_id)
+        
+        df = ColumnarStore.carregar_rollup(fonte_id, nivel, inicio, fim, simulado=simulado)
+        if df is not None:
+            DataFrameCache.armazenar(chave, versao, df)
+            return df.copy(deep=False)
+        
+        return None
+    
+    @staticmethod
+    def _gerar_dados_iniciais(fonte_id):
+        """Gera dados simulados automaticamente para uma fonte sem dados"""
+        try:
+            from app.data_processors.data_importer import GrowattDataImporter
+            resultado = GrowattDataImporter.gerar_dados_simulados(fonte_id, dias=30)
+            return resultado['sucesso']
+        except Exception as e:
+            print(f"Erro ao gerar dados simulados automaticamente: {str(e)}")
+            return False
+    
     @staticmethod
     def calcular_metricas_gerais(fonte_id):
         """Calcula métricas gerais para o dashboard"""
         if not PANDAS_AVAILABLE:
             return DashboardController._gerar_metricas_ficticias()
             
-        df = DashboardController.get_dados_fonte(fonte_id)
+        diario = DashboardController.get_agregacao(fonte_id, 'diario')
         
-        if df is None or df.empty:
+        if diario is None or diario.empty:
             return DashboardController._gerar_metricas_ficticias()
         
-        # Cálculo das métricas
-        total_energia = df['energia_kwh'].sum()
-        potencia_maxima = df['potencia_kw'].max()
+        # Cálculo das métricas a partir da agregação diária (uma linha por dia)
+        total_energia = diario['energia_kwh'].sum()
+        potencia_maxima = diario['potencia_max'].max()
         
         # Calcular a produção média diária
-        df['data'] = df['data_hora'].dt.date
-        energia_por_dia = df.groupby('data')['energia_kwh'].sum()
-        media_diaria = energia_por_dia.mean()
-        dias_monitorados = len(energia_por_dia)
+        media_diaria = diario['energia_kwh'].mean()
+        dias_monitorados = len(diario)
         
         # Última atualização
-        ultima_atualizacao = df['data_hora'].max()
+        ultima_atualizacao = diario['ultima_leitura'].max()
         
         return {
             'total_energia': round(total_energia, 2),
@@ -126,29 +169,223 @@ class DashboardController:
         }
     
     @staticmethod
-    def get_dados_producao_diaria(fonte_id):
-        """Obtém dados de produção diária para gráficos"""
+    def get_dados_producao_diaria(fonte_id, colunar=False, resolucao='diaria', inicio=None, fim=None, max_pontos=None):
+        """
+        Obtém dados de produção para gráficos
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            colunar (bool): Retorna {'datas': [...], 'energia': [...]} em vez de uma lista de registros
+            resolucao (str): 'diaria', 'horaria' ou 'bruta' (leituras de 15 minutos)
+            inicio (datetime): Início do período (opcional)
+            fim (datetime): Fim do período, inclusivo (opcional)
+            max_pontos (int): Reduz a série a no máximo esta quantidade de pontos (LTTB)
+        """
         if not PANDAS_AVAILABLE:
-            return DashboardController._gerar_dados_diarios_ficticios()
+            return DashboardController._formatar_resposta(
+                DashboardController._gerar_dados_diarios_ficticios(), colunar, {'data': 'datas', 'energia': 'energia'})
+        
+        colunas = DashboardController.get_serie_producao(fonte_id, resolucao, inicio, fim, max_pontos)
+        
+        if colunas is None:
+            if resolucao != 'diaria' or inicio is not None or fim is not None:
+                # Nenhum dado no período/resolução solicitados (mesmas colunas de uma série com dados)
+                colunas = {'datas': [], 'energia': []}
+                if resolucao != 'diaria':
+                    colunas['potencia'] = []
+            else:
+                return DashboardController._formatar_resposta(
+                    DashboardController._gerar_dados_diarios_ficticios(), colunar, {'data': 'datas', 'energia': 'energia'})
+        
+        if colunar:
+            return colunas
+        
+        # Converter para o formato adequado para o gráfico (um registro por ponto)
+        nomes = ['data'] + [nome for nome in colunas if nome != 'datas']
+        return [dict(zip(nomes, valores)) for valores in zip(colunas['datas'], *(colunas[nome] for nome in nomes[1:]))]
+    
+    @staticmethod
+    def get_serie_producao(fonte_id, resolucao='diaria', inicio=None, fim=None, max_pontos=None):
+        """
+        Série de produção de uma fonte em formato colunar
+        
+        As séries diária e horária vêm das agregações (recortadas por busca
+        binária); a bruta das leituras do período. Com max_pontos a série é
+        reduzida por LTTB (energia nas agregações, potência nas leituras) e
+        todas as colunas usam os mesmos pontos.
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            resolucao (str): 'diaria', 'horaria' ou 'bruta'
+            inicio (datetime): Início do período (opcional)
+            fim (datetime): Fim do período, inclusivo (opcional)
+            max_pontos (int): Quantidade máxima de pontos, no mínimo MIN_PONTOS (opcional)
+            
+        Returns:
+            dict: 'datas' e as colunas da série ('energia'; 'potencia' nas
+            resoluções horária e bruta) ou None se não houver dados
             
-        df = DashboardController.get_dados_fonte(fonte_id)
+        Raises:
+            ValueError: Resolução desconhecida ou max_pontos menor que MIN_PONTOS
+        """
+        if max_pontos is not None and max_pontos < DashboardController.MIN_PONTOS:
+            raise ValueError(f"max_pontos deve ser no mínimo {DashboardController.MIN_PONTOS}")
         
-        if df is None or df.empty:
-            return DashboardController._gerar_dados_diarios_ficticios()
+        if resolucao == 'bruta':
+            df = DashboardController.get_dados_fonte(fonte_id, inicio, fim)
+            if df is None or df.empty:
+                return None
+            data_hora = df['data_hora'].to_numpy()
+            # Leituras em float32: converter antes de arredondar para não gerar decimais espúrios no JSON
+            valores = {
+                'potencia': np.nan_to_num(df['potencia_kw'].to_numpy(dtype='float64')),
+                'energia': np.nan_to_num(df['energia_kwh'].to_numpy(dtype='float64'))
+            }
+            referencia = 'potencia'
+        elif resolucao in ('diaria', 'horaria'):
+            nivel = 'diario' if resolucao == 'diaria' else 'horario'
+            tabela = DashboardController.get_agregacao(fonte_id, nivel)
+            if tabela is None or tabela.empty:
+                return None
+            
+            # Recortar o período por busca binária (agregação completa fica no cache)
+            data_hora = tabela['data_hora'].to_numpy()
+            esquerda = 0 if inicio is None else np.searchsorted(data_hora, np.datetime64(inicio, 'ns'), side='left')
+            direita = len(data_hora) if fim is None else np.searchsorted(data_hora, np.datetime64(fim, 'ns'), side='right')
+            if direita <= esquerda:
+                return None
+            
+            data_hora = data_hora[esquerda:direita]
+            valores = {'energia': tabela['energia_kwh'].to_numpy()[esquerda:direita]}
+            if resolucao == 'horaria':
+                valores['potencia'] = np.nan_to_num(tabela['potencia_media'].to_numpy()[esquerda:direita])
+            referencia = 'energia'
+        else:
+            raise ValueError(f"Resolução desconhecida: {resolucao}")
         
-        # Agrupar por data e somar energia
-        df['data'] = df['data_hora'].dt.date
-        producao_diaria = df.groupby('data')['energia_kwh'].sum().reset_index()
+        if max_pontos is not None:
+            selecionados = Downsampling.lttb(data_hora.astype('int64'), valores[referencia], max_pontos)
+            data_hora = data_hora[selecionados]
+            valores = {nome: serie[selecionados] for nome, serie in valores.items()}
         
-        # Converter para o formato adequado para o gráfico
-        resultado = []
-        for _, row in producao_diaria.iterrows():
-            resultado.append({
-                'data': row['data'].strftime('%d/%m/%Y'),
-                'energia': round(row['energia_kwh'], 2)
-            })
+        return {
+            'datas': DashboardController._formatar_datas(data_hora, com_hora=resolucao != 'diaria'),
+            **{nome: np.round(serie, 2).tolist() for nome, serie in valores.items()}
+        }
+    
+    @staticmethod
+    def _formatar_datas(valores, com_hora=False):
+        """
+        Formata datetime64 como DD/MM/AAAA (ou DD/MM/AAAA HH:MM) sem laço Python
         
-        return resultado
+        Reordena os caracteres da representação ISO (AAAA-MM-DDTHH:MM) gerada pelo NumPy.
+        """
+        if len(valores) == 0:
+            return []
+        unidade, tamanho = ('m', 16) if com_hora else ('D', 10)
+        iso = np.datetime_as_string(np.asarray(valores).astype(f'datetime64[{unidade}]')).astype(f'U{tamanho}')
+        ordem = [8, 9, 7, 5, 6, 4, 0, 1, 2, 3] + ([10, 11, 12, 13, 14, 15] if com_hora else [])
+        caracteres = iso.view('U1').reshape(len(iso), tamanho)[:, ordem]
+        caracteres[:, [2, 5]] = '/'
+        if com_hora:
+            caracteres[:, 10] = ' '
+        return np.ascontiguousarray(caracteres).view(f'U{tamanho}').ravel().tolist()
+    
+    @staticmethod
+    def _formatar_resposta(registros, colunar, colunas):
+        """Converte uma lista de registros no formato colunar (nome do campo -> nome da coluna)"""
+        if not colunar:
+            return registros
+        return {coluna: [registro[campo] for registro in registros] for campo, coluna in colunas.items()}
+    
+    @staticmethod
+    def get_producao_diaria_frota(fonte_ids=None, inicio=None, fim=None, max_workers=8):
+        """
+        Produção diária somada de várias fontes, com o detalhamento por fonte
+        
+        As agregações diárias das fontes são carregadas em paralelo (e ficam
+        no cache de dados); a soma por dia e os totais de todas as fontes são
+        calculados em uma única passada sobre os arrays concatenados.
+        Fontes sem dados reais não são simuladas (e eventuais dados simulados
+        não entram nos totais): são listadas em 'sem_dados'.
+        
+        Args:
+            fonte_ids (list): IDs das fontes (todas as cadastradas se None)
+            inicio (datetime): Primeiro dia (opcional)
+            fim (datetime): Último dia, inclusivo (opcional)
+            max_workers (int): Máximo de fontes carregadas simultaneamente
+            
+        Returns:
+            dict: 'datas', 'energia' e 'fontes_com_dados' por dia da frota,
+            'total_kwh', 'por_fonte' (total, dias, média e série alinhada
+            às datas) e 'sem_dados'; None se pandas não estiver disponível
+        """
+        if not PANDAS_AVAILABLE:
+            return None
+        
+        fontes = {fonte.id: fonte for fonte in FonteEnergiaRepository.listar_objetos()}
+        if fonte_ids is None:
+            fonte_ids = list(fontes)
+        else:
+            fonte_ids = [fonte_id for fonte_id in fonte_ids if fonte_id in fontes]
+        
+        def carregar(fonte_id):
+            if not ColumnarStore.possui_dados(fonte_id):
+                return None
+            return DashboardController.get_agregacao(fonte_id, 'diario', inicio, fim)
+        
+        if len(fonte_ids) > 1 and max_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(fonte_ids))) as executor:
+                diarios = list(executor.map(carregar, fonte_ids))
+        else:
+            diarios = [carregar(fonte_id) for fonte_id in fonte_ids]
+        
+        com_dados = [(fonte_id, diario) for fonte_id, diario in zip(fonte_ids, diarios)
+                     if diario is not None and not diario.empty]
+        sem_dados = [fonte_id for fonte_id, diario in zip(fonte_ids, diarios)
+                     if diario is None or diario.empty]
+        
+        if not com_dados:
+            return {'datas': [], 'energia': [], 'fontes_com_dados': [], 'total_kwh': 0.0,
+                    'por_fonte': [], 'sem_dados': sem_dados}
+        
+        # Arrays concatenados de todas as fontes: dia, linha (fonte) e energia
+        dias = np.concatenate([diario['data_hora'].to_numpy() for _, diario in com_dados])
+        linhas = np.repeat(np.arange(len(com_dados)), [len(diario) for _, diario in com_dados])
+        energia = np.nan_to_num(np.concatenate([diario['energia_kwh'].to_numpy() for _, diario in com_dados]))
+        
+        datas, colunas = np.unique(dias, return_inverse=True)
+        
+        # Matriz fontes x dias (dias sem leitura da fonte ficam com zero)
+        matriz = np.zeros((len(com_dados), len(datas)))
+        matriz[linhas, colunas] = energia
+        possui = np.zeros((len(com_dados), len(datas)), dtype=bool)
+        possui[linhas, colunas] = True
+        
+        total_por_dia = matriz.sum(axis=0)
+        total_por_fonte = matriz.sum(axis=1)
+        dias_por_fonte = possui.sum(axis=1)
+        
+        por_fonte = [
+            {
+                'fonte_id': fonte_id,
+                'nome': fontes[fonte_id].nome,
+                'total_kwh': round(float(total_por_fonte[i]), 2),
+                'dias': int(dias_por_fonte[i]),
+                'media_diaria_kwh': round(float(total_por_fonte[i] / dias_por_fonte[i]), 2),
+                'energia': np.round(matriz[i], 2).tolist()
+            }
+            for i, (fonte_id, _) in enumerate(com_dados)
+        ]
+        
+        return {
+            'datas': pd.DatetimeIndex(datas).strftime('%d/%m/%Y').tolist(),
+            'energia': np.round(total_por_dia, 2).tolist(),
+            'fontes_com_dados': possui.sum(axis=0).tolist(),
+            'total_kwh': round(float(total_por_dia.sum()), 2),
+            'por_fonte': por_fonte,
+            'sem_dados': sem_dados
+        }
     
     @staticmethod
     def _gerar_dados_diarios_ficticios():
@@ -183,47 +420,100 @@ class DashboardController:
         return resultado
     
     @staticmethod
-    def get_dados_producao_horaria(fonte_id, dia=None):
-        """Obtém dados de produção por hora para um dia específico"""
+    def get_dados_producao_horaria(fonte_id, dia=None, colunar=False):
+        """
+        Obtém dados de produção por hora para um dia específico
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            dia (str): Dia no formato AAAA-MM-DD (padrão: último dia com dados)
+            colunar (bool): Retorna {'horas': [...], 'potencia': [...]} em vez de uma lista de registros
+        """
         if not PANDAS_AVAILABLE:
-            return DashboardController._gerar_dados_horarios_ficticios()
+            return DashboardController._formatar_resposta(
+                DashboardController._gerar_dados_horarios_ficticios(), colunar, {'hora': 'horas', 'potencia': 'potencia'})
             
-        df = DashboardController.get_dados_fonte(fonte_id)
+        horario = DashboardController.get_agregacao(fonte_id, 'horario')
         
-        if df is None or df.empty:
-            return DashboardController._gerar_dados_horarios_ficticios()
+        if horario is None or horario.empty:
+            return DashboardController._formatar_resposta(
+                DashboardController._gerar_dados_horarios_ficticios(), colunar, {'hora': 'horas', 'potencia': 'potencia'})
         
         # Se não for especificado o dia, usa o último dia com dados
         if dia is None:
-            dia = df['data_hora'].dt.date.max()
+            dia = horario['data_hora'].iloc[-1].normalize()
         else:
-            dia = datetime.strptime(dia, '%Y-%m-%d').date()
+            dia = pd.Timestamp(datetime.strptime(dia, '%Y-%m-%d'))
         
-        # Filtrar para o dia específico
-        df_dia = df[df['data_hora'].dt.date == dia]
+        # Localizar as horas do dia por busca binária (agregação ordenada)
+        inicio = horario['data_hora'].searchsorted(dia, side='left')
+        fim = horario['data_hora'].searchsorted(dia + pd.Timedelta(days=1), side='left')
+        df_dia = horario.iloc[inicio:fim]
         
         if df_dia.empty:
-            return DashboardController._gerar_dados_horarios_ficticios()
-            
-        # Agrupar por hora
-        df_dia['hora'] = df_dia['data_hora'].dt.hour
-        producao_horaria = df_dia.groupby('hora')['potencia_kw'].mean().reset_index()
+            return DashboardController._formatar_resposta(
+                DashboardController._gerar_dados_horarios_ficticios(), colunar, {'hora': 'horas', 'potencia': 'potencia'})
         
-        # Converter para o formato adequado para o gráfico
-        resultado = []
-        for hora in range(24):
-            energia = 0
-            hora_df = producao_horaria[producao_horaria['hora'] == hora]
-            if not hora_df.empty:
-                energia = round(hora_df['potencia_kw'].iloc[0], 2)
+        # Potência média por hora (horas sem leituras ficam com zero)
+        _, matriz, _ = DashboardController._matriz_dia_hora(df_dia, 'potencia')
+        
+        horas = [f"{hora:02d}:00" for hora in range(24)]
+        potencias = [round(potencia, 2) for potencia in matriz[0].tolist()]
+        
+        if colunar:
+            return {'horas': horas, 'potencia': potencias}
+        return [{'hora': hora, 'potencia': potencia} for hora, potencia in zip(horas, potencias)]
+        
+    @staticmethod
+    def _matriz_dia_hora(horario, valor):
+        """Matriz dias x 24 horas de uma tabela de agregação horária ('potencia' média ou 'energia')"""
+        coluna = 'potencia_media' if valor == 'potencia' else 'energia_kwh'
+        return Rollups.matriz_dia_hora(
+            horario['data_hora'].to_numpy().astype('int64') // NS_POR_HORA,
+            horario[coluna].to_numpy()
+        )
+    
+    @staticmethod
+    def get_mapa_calor(fonte_id, inicio=None, fim=None, valor='potencia'):
+        """
+        Obtém a matriz dia x hora da produção de uma fonte (mapa de calor)
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            inicio (datetime): Primeiro dia (opcional)
+            fim (datetime): Último dia, inclusivo (opcional)
+            valor (str): 'potencia' (média da hora, kW) ou 'energia' (kWh)
             
-            resultado.append({
-                'hora': f"{hora:02d}:00",
-                'potencia': energia
-            })
+        Returns:
+            dict: 'datas', 'horas' e 'valores' (uma linha de 24 valores por dia;
+            horas sem leitura são None) ou None se não houver dados
+        """
+        if not PANDAS_AVAILABLE:
+            return None
+            
+        horario = DashboardController.get_agregacao(fonte_id, 'horario')
+        if horario is None or horario.empty:
+            return None
         
-        return resultado
+        # Recortar o período por busca binária
+        data_hora = horario['data_hora']
+        esquerda = 0 if inicio is None else data_hora.searchsorted(pd.Timestamp(inicio).normalize(), side='left')
+        direita = len(horario) if fim is None else data_hora.searchsorted(
+            pd.Timestamp(fim).normalize() + pd.Timedelta(days=1), side='left')
+        if direita <= esquerda:
+            return None
+        
+        dias, matriz, presentes = DashboardController._matriz_dia_hora(horario.iloc[esquerda:direita], valor)
+        
+        valores = np.round(matriz, 2).astype(object)
+        valores[~presentes] = None
         
+        return {
+            'datas': DashboardController._formatar_datas(dias.astype('datetime64[D]')),
+            'horas': [f"{hora:02d}:00" for hora in range(24)],
+            'valores': valores.tolist()
+        }
+    
     @staticmethod
     def _gerar_dados_horarios_ficticios():
         """Gera dados fictícios de produção horária para demonstração"""
@@ -1,13 +1,20 @@
 import os
 import json
-import numpy as np
-import pandas as pd
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
 from datetime import datetime, timedelta
 
+from app.importacao import importar_tardio
 from app.services.weather_service import WeatherService
+from app.data_processors.columnar_store import ColumnarStore
 from app.controllers.dashboard_controller import DashboardController
 from app.models.fonte_energia import FonteEnergiaRepository
 
+# Carregados no primeiro uso (não atrasam a inicialização da aplicação)
+np = importar_tardio('numpy')
+pd = importar_tardio('pandas')
+
 class GenerationForecaster:
     """Classe para previsão de geração de energia solar com base em dados meteorológicos"""
     
@@ -32,6 +39,32 @@ class GenerationForecaster:
         'daylight_hours': 12.0  # 12 horas de luz
     }
     
+    # Média de horas de sol pleno no Brasil (produção teórica = capacidade x horas x fator)
+    HORAS_SOL_PLENO = 4.2
+    
+    # Capacidade usada quando a da fonte não puder ser convertida (kWp)
+    CAPACIDADE_PADRAO = 5.0
+    
+    # Idade máxima de uma previsão salva (após isso é marcada como desatualizada)
+    FORECAST_MAX_AGE = 12 * 3600
+    
+    # Idade a partir da qual a previsão é regenerada em segundo plano (antes de expirar)
+    FORECAST_REFRESH_AGE = int(float(os.environ.get('FORECAST_REFRESH_HOURS', '9')) * 3600)
+    
+    # Idade a partir da qual uma previsão simulada salva (fallback sem API de clima) é
+    # regenerada; também é o intervalo entre tentativas enquanto a regeneração falhar
+    FORECAST_SIMULATED_TTL = int(float(os.environ.get('FORECAST_SIMULATED_MINUTES', '10')) * 60)
+    
+    # Atualizações em segundo plano
+    _refresh_executor = None
+    _refresh_pending = set()
+    _refresh_lock = threading.Lock()
+    _prewarmer = None
+    
+    # Regenerações em andamento por fonte (as chamadas concorrentes aguardam a mesma)
+    _inflight = {}
+    _inflight_lock = threading.Lock()
+    
     @classmethod
     def predict_generation(cls, fonte_id, days=5):
         """
@@ -54,146 +87,416 @@ class GenerationForecaster:
             print(f"Fonte com ID {fonte_id} não encontrada")
             return None
             
-        # Obter coordenadas geográficas da localização
-        coords = WeatherService.get_location_coords(fonte.localizacao)
-        if not coords:
-            print(f"Não foi possível obter coordenadas para: {fonte.localizacao}")
-            # Usar previsão simulada como fallback
-            return cls._generate_simulated_forecast(fonte, days)
+        # Geocoding e previsão do tempo compartilham um prazo total (WEATHER_REQUEST_BUDGET)
+        with WeatherService.deadline():
+            # Obter coordenadas geográficas da localização (resolvidas ao salvar a fonte)
+            coords = fonte.coordenadas
+            if not coords:
+                coords = cls.resolver_coordenadas(fonte)
+            if not coords:
+                print(f"Não foi possível obter coordenadas para: {fonte.localizacao}")
+                # Usar previsão simulada como fallback
+                return cls._generate_simulated_forecast(fonte, days)
+                
+            lat, lon = coords
+            
+            # Obter previsão do tempo
+            forecast = WeatherService.get_forecast(lat, lon, days)
+        return cls._prever_fonte(fonte, forecast, days)
+    
+    @classmethod
+    def regenerate_forecast(cls, fonte_id, days=5):
+        """
+        Regenera a previsão de uma fonte, agrupando chamadas concorrentes
+        
+        Apenas uma regeneração por fonte é executada por vez (inclusive as
+        de predict_fleet); quem chamar enquanto ela está em andamento aguarda
+        e recebe o mesmo resultado.
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            days (int): Número de dias para previsão
             
-        lat, lon = coords
+        Returns:
+            list: Lista com previsões de geração ou None em caso de erro
+        """
+        futuro, executar = cls._reservar_regeneracao(fonte_id)
+        if not executar:
+            return futuro.result()
+            
+        try:
+            futuro.set_result(cls.predict_generation(fonte_id, days))
+        except Exception as e:
+            futuro.set_exception(e)
+        finally:
+            cls._liberar_regeneracao(fonte_id)
+        return futuro.result()
+    
+    @classmethod
+    def _reservar_regeneracao(cls, fonte_id):
+        """
+        Registra a regeneração da previsão de uma fonte
         
-        # Obter previsão do tempo
-        forecast = WeatherService.get_forecast(lat, lon, days)
+        Returns:
+            tuple: (Future da regeneração, True se quem chamou deve executá-la
+            ou False se já há uma em andamento)
+        """
+        with cls._inflight_lock:
+            futuro = cls._inflight.get(fonte_id)
+            if futuro is not None:
+                return futuro, False
+            futuro = Future()
+            cls._inflight[fonte_id] = futuro
+            return futuro, True
+    
+    @classmethod
+    def _liberar_regeneracao(cls, fonte_id):
+        """Remove o registro da regeneração (após definir o resultado do Future)"""
+        with cls._inflight_lock:
+            del cls._inflight[fonte_id]
+    
+    @classmethod
+    def _prever_fonte(cls, fonte, forecast, days):
+        """Calcula (e salva) a previsão de uma fonte a partir da previsão do tempo da sua localização"""
         if not forecast:
             print("Não foi possível obter previsão do tempo - usando dados simulados")
             return cls._generate_simulated_forecast(fonte, days)
             
-        # Obter histórico de produção
-        df_producao = cls._obter_historico_producao(fonte_id)
-        if df_producao is None or df_producao.empty:
-            print("Histórico de produção não disponível")
-            return cls._estimar_sem_historico(fonte, forecast)
+        return cls._prever_grupo([fonte], forecast)[0]
+    
+    @classmethod
+    def _prever_grupo(cls, fontes, forecast):
+        """
+        Calcula e salva a previsão de várias fontes que compartilham a mesma previsão do tempo
         
-        # Calcular previsão com base no histórico e dados meteorológicos
-        previsoes = cls._calcular_previsao(fonte, df_producao, forecast)
+        Os fatores climáticos e as estimativas de todas as fontes x dias são
+        calculados de uma vez por estimar_energia.
         
-        # Salvar previsões
-        cls._salvar_previsao(fonte_id, previsoes)
+        Returns:
+            list: Lista de previsões (uma lista por fonte, na ordem recebida)
+        """
+        capacidades = []
+        medias = []
+        for fonte in fontes:
+            capacidades.append(cls._obter_capacidade(fonte))
+            
+            # Obter histórico de produção
+            df_producao = cls._obter_historico_producao(fonte.id)
+            if df_producao is None or df_producao.empty:
+                print("Histórico de produção não disponível")
+                medias.append(np.nan)
+            else:
+                medias.append(df_producao['energia_kwh'].mean())
         
-        return previsoes
-    
-    @classmethod
-    def _obter_historico_producao(cls, fonte_id):
-        """Obtém o histórico de produção da fonte"""
-        try:
-            # Usar o controller de dashboard para obter os dados
-            df = DashboardController.get_dados_fonte(fonte_id)
-            
-            if df is None or df.empty:
-                return None
-                
-            # Agrupar por data para obter produção diária
-            df['data'] = pd.to_datetime(df['data_hora']).dt.date
-            producao_diaria = df.groupby('data')['energia_kwh'].sum().reset_index()
+        estimativa = cls.estimar_energia(
+            cls._tabela_clima(forecast),
+            np.array(capacidades)[:, None],
+            np.array(medias, dtype='float64')[:, None]
+        )
+        
+        resultado = []
+        for i, fonte in enumerate(fontes):
+            # Sem histórico a referência da mensagem é a capacidade nominal
+            referencia = capacidades[i] if np.isnan(medias[i]) else medias[i]
+            previsoes = cls._montar_previsoes(forecast, estimativa, i, referencia)
             
-            # Ordenar por data
-            producao_diaria = producao_diaria.sort_values('data')
+            # Salvar previsões
+            cls._salvar_previsao(fonte.id, previsoes)
+            resultado.append(previsoes)
             
-            return producao_diaria
-        except Exception as e:
-            print(f"Erro ao obter histórico de produção: {str(e)}")
-            return None
+        return resultado
     
     @classmethod
-    def _estimar_sem_historico(cls, fonte, forecast):
+    def predict_fleet(cls, days=5, max_workers=8, fonte_ids=None):
         """
-        Estima a geração quando não há histórico disponível
-        Usa a capacidade nominal da fonte e eficiência estimada
+        Calcula e salva a previsão de geração de todas as fontes em uma execução
+        
+        As fontes são agrupadas por célula da grade de clima; a previsão do
+        tempo de cada célula é obtida uma única vez, em paralelo, por um pool
+        de threads limitado a max_workers. As coordenadas ainda não resolvidas
+        são geocodificadas no mesmo pool, com uma consulta por endereço
+        distinto (compartilhada pelas fontes do endereço), cada uma dentro do
+        prazo por requisição.
+        
+        As fontes participam do mesmo controle de regenerações em andamento
+        de regenerate_forecast: uma fonte que já está sendo regenerada não é
+        recalculada (o resultado em andamento é aguardado e a fonte é listada
+        em 'compartilhadas'), e quem pedir a regeneração de uma fonte durante
+        a execução recebe a previsão calculada aqui.
+        
+        Args:
+            days (int): Número de dias para previsão
+            max_workers (int): Máximo de consultas simultâneas à API de clima
+            fonte_ids (list): IDs das fontes (todas se None)
+            
+        Returns:
+            dict: Relatório com quantidades, falhas, tempo total e vazão
         """
-        previsoes = []
+        inicio = time.perf_counter()
+        os.makedirs(cls.FORECAST_DIR, exist_ok=True)
         
-        # Capacidade nominal em kWp
+        fontes = FonteEnergiaRepository.listar_objetos()
+        if fonte_ids is not None:
+            ids = set(fonte_ids)
+            fontes = [fonte for fonte in fontes if fonte.id in ids]
+        total_fontes = len(fontes)
+        
+        # Reservar as fontes; as que já estão em regeneração não são recalculadas
+        reservas = {fonte.id: cls._reservar_regeneracao(fonte.id) for fonte in fontes}
+        compartilhadas = [fonte.id for fonte in fontes if not reservas[fonte.id][1]]
+        fontes = [fonte for fonte in fontes if reservas[fonte.id][1]]
+        
+        previsoes = {}
         try:
-            capacidade = float(fonte.capacidade)
-        except (ValueError, TypeError):
-            capacidade = 5.0  # Valor padrão se não for possível converter
+            resultado, grupos, tempo_clima = cls._prever_frota(fontes, days, max_workers, previsoes)
+        finally:
+            # Entregar o resultado (ou None em caso de erro) a quem aguarda cada fonte
+            for fonte in fontes:
+                reservas[fonte.id][0].set_result(previsoes.get(fonte.id))
+                cls._liberar_regeneracao(fonte.id)
         
-        # Eficiência média diária (horas de sol equivalentes a plena carga)
-        eficiencia_base = 4.2  # Média de horas de sol pleno no Brasil
+        for fonte_id in compartilhadas:
+            try:
+                reservas[fonte_id][0].result()
+            except Exception as e:
+                print(f"Erro na regeneração em andamento da fonte {fonte_id}: {str(e)}")
         
-        for day_forecast in forecast:
-            # Calcular fator climático
-            fator_climatico = cls._calcular_fator_climatico(day_forecast)
+        tempo_total = time.perf_counter() - inicio
+        return {
+            'fontes': total_fontes,
+            'localizacoes': len(grupos),
+            'previsoes_salvas': len(resultado['sucesso']),
+            'simuladas': resultado['simuladas'],
+            'falhas': resultado['falhas'],
+            'compartilhadas': compartilhadas,
+            'tempo_clima_s': round(tempo_clima, 3),
+            'tempo_total_s': round(tempo_total, 3),
+            'fontes_por_segundo': round(total_fontes / tempo_total, 1) if tempo_total > 0 else None
+        }
+    
+    @classmethod
+    def _prever_frota(cls, fontes, days, max_workers, previsoes):
+        """
+        Calcula e salva a previsão das fontes reservadas por predict_fleet
+        
+        Args:
+            previsoes (dict): Recebe a previsão calculada de cada fonte (fonte_id -> lista)
             
-            # Estimar produção com base na capacidade e condições climáticas
-            energia_estimada = round(capacidade * eficiencia_base * fator_climatico, 2)
+        Returns:
+            tuple: (ids por situação, grupos por célula, tempo de obtenção do clima)
+        """
+        inicio_clima = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            # Geocodificar em paralelo as fontes sem coordenadas armazenadas, uma
+            # única consulta por endereço (normalizado) compartilhada pelas fontes
+            enderecos = {}
+            for fonte in fontes:
+                if not fonte.coordenadas and fonte.localizacao:
+                    enderecos.setdefault(WeatherService.normalize_address(fonte.localizacao), []).append(fonte)
+            geocodificacao = {endereco: executor.submit(cls._obter_coordenadas, fontes_endereco[0])
+                              for endereco, fontes_endereco in enderecos.items()}
+            
+            coordenadas = {}
+            for endereco, futuro in geocodificacao.items():
+                try:
+                    coords = futuro.result()
+                except Exception as e:
+                    print(f"Erro ao obter coordenadas de '{endereco}': {str(e)}")
+                    coords = None
+                for fonte in enderecos[endereco]:
+                    if coords and not fonte.coordenadas:
+                        cls._armazenar_coordenadas(fonte, coords)
+                    coordenadas[fonte.id] = coords
+            
+            # Agrupar as fontes por localização (célula da grade)
+            grupos = {}
+            sem_coordenadas = []
+            for fonte in fontes:
+                coords = fonte.coordenadas or coordenadas.get(fonte.id)
+                if coords:
+                    grupos.setdefault(WeatherService.get_grid_cell(*coords), []).append(fonte)
+                else:
+                    sem_coordenadas.append(fonte)
+            
+            # Obter a previsão do tempo de cada localização uma única vez
+            futuros = {cell: executor.submit(cls._obter_previsao_tempo, cell[0], cell[1], days)
+                       for cell in grupos}
+            clima = {}
+            for cell, futuro in futuros.items():
+                try:
+                    clima[cell] = futuro.result()
+                except Exception as e:
+                    print(f"Erro ao obter previsão do tempo para {cell}: {str(e)}")
+                    clima[cell] = None
+        tempo_clima = time.perf_counter() - inicio_clima
+        
+        # Calcular e salvar a previsão de cada fonte
+        resultado = {'sucesso': [], 'simuladas': [], 'falhas': []}
+        for cell, fontes_cell in grupos.items():
+            if clima[cell]:
+                try:
+                    # Todas as fontes da célula em uma única passada vetorizada
+                    for fonte, previsao in zip(fontes_cell, cls._prever_grupo(fontes_cell, clima[cell])):
+                        previsoes[fonte.id] = previsao
+                    resultado['sucesso'].extend(fonte.id for fonte in fontes_cell)
+                    continue
+                except Exception as e:
+                    print(f"Erro ao prever geração da célula {cell}: {str(e)}")
+            
+            for fonte in fontes_cell:
+                try:
+                    previsoes[fonte.id] = cls._prever_fonte(fonte, clima[cell], days)
+                    chave = 'sucesso' if clima[cell] else 'simuladas'
+                    resultado[chave].append(fonte.id)
+                except Exception as e:
+                    print(f"Erro ao prever geração da fonte {fonte.id}: {str(e)}")
+                    resultado['falhas'].append(fonte.id)
+        for fonte in sem_coordenadas:
+            # Mesmo resultado de regenerate_forecast para fontes sem coordenadas
+            previsoes[fonte.id] = cls._generate_simulated_forecast(fonte, days)
+            resultado['simuladas'].append(fonte.id)
+        
+        return resultado, grupos, tempo_clima
+    
+    @classmethod
+    def _obter_coordenadas(cls, fonte):
+        """Resolve as coordenadas de uma fonte dentro do prazo por requisição"""
+        with WeatherService.deadline():
+            return cls.resolver_coordenadas(fonte)
+    
+    @classmethod
+    def _obter_previsao_tempo(cls, lat, lon, days):
+        """Obtém a previsão do tempo de uma localização dentro do prazo por requisição"""
+        with WeatherService.deadline():
+            return WeatherService.get_forecast(lat, lon, days)
+    
+    @classmethod
+    def resolver_coordenadas(cls, fonte, salvar=True):
+        """
+        Resolve as coordenadas da localização da fonte e as armazena no modelo
+        
+        Args:
+            fonte: Objeto FonteEnergia
+            salvar (bool): Persiste a fonte com as coordenadas resolvidas
             
-            # Criar registro de previsão
-            previsao = {
-                **day_forecast,
-                'energia_estimada': energia_estimada,
-                'fator_climatico': round(fator_climatico * 100, 1),
-                'mensagem': cls._gerar_mensagem(energia_estimada, fator_climatico, capacidade)
-            }
+        Returns:
+            tuple: (latitude, longitude) ou None se não for possível resolver
+        """
+        coords = WeatherService.get_location_coords(fonte.localizacao) if fonte.localizacao else None
+        if not coords:
+            return None
+        return cls._armazenar_coordenadas(fonte, coords, salvar)
+    
+    @classmethod
+    def _armazenar_coordenadas(cls, fonte, coords, salvar=True):
+        """Armazena coordenadas já resolvidas no modelo (e persiste a fonte se salvar)"""
+        fonte.latitude, fonte.longitude = coords
+        if salvar and fonte.id is not None:
+            FonteEnergiaRepository.salvar(fonte)
+        return fonte.coordenadas
+    
+    @classmethod
+    def _obter_historico_producao(cls, fonte_id):
+        """Obtém o histórico de produção (apenas dados reais) da fonte"""
+        try:
+            # Sem dados reais não há histórico: não gerar dados simulados para a fonte
+            if not ColumnarStore.possui_dados(fonte_id):
+                return None
+                
+            # Usar a agregação diária mantida na importação
+            diario = DashboardController.get_agregacao(fonte_id, 'diario')
             
-            previsoes.append(previsao)
+            if diario is None or diario.empty:
+                return None
+                
+            # Produção diária já ordenada por dia (inteiro desde 1970-01-01)
+            producao_diaria = pd.DataFrame({
+                'dia': ColumnarStore.dias(diario['data_hora']),
+                'energia_kwh': diario['energia_kwh']
+            })
             
-        return previsoes
+            return producao_diaria
+        except Exception as e:
+            print(f"Erro ao obter histórico de produção: {str(e)}")
+            return None
     
     @classmethod
-    def _calcular_previsao(cls, fonte, df_historico, forecast):
-        """Calcula a previsão com base no histórico e dados meteorológicos"""
-        previsoes = []
-        
-        # Calcular média histórica de produção
-        media_historica = df_historico['energia_kwh'].mean()
-        
-        # Capacidade nominal em kWp
+    def _obter_capacidade(cls, fonte):
+        """Capacidade nominal da fonte em kWp"""
         try:
-            capacidade = float(fonte.capacidade)
+            return float(fonte.capacidade)
         except (ValueError, TypeError):
-            capacidade = 5.0  # Valor padrão se não for possível converter
+            return cls.CAPACIDADE_PADRAO  # Valor padrão se não for possível converter
+    
+    @classmethod
+    def _tabela_clima(cls, forecast):
+        """Converte a previsão do tempo (lista de dias) em colunas NumPy"""
+        return {campo: np.array([dia[campo] for dia in forecast], dtype='float64')
+                for campo in cls.WEATHER_WEIGHTS}
+    
+    @classmethod
+    def _montar_previsoes(cls, forecast, estimativa, linha, referencia):
+        """Cria os registros de previsão de uma fonte (linha da estimativa)"""
+        fatores = estimativa['fator_climatico'][linha].tolist()
+        energias = estimativa['energia_estimada'][linha].tolist()
+        percentuais = cls._arredondar(estimativa['fator_climatico'][linha] * 100, 1).tolist()
         
-        for day_forecast in forecast:
-            # Calcular fator climático
-            fator_climatico = cls._calcular_fator_climatico(day_forecast)
-            
-            # Estimar produção com base no histórico e condições climáticas
-            energia_estimada = round(media_historica * fator_climatico, 2)
-            
-            # Comparar com produção teórica baseada na capacidade
-            producao_teorica = capacidade * 4.2 * fator_climatico  # 4.2h de sol pleno
-            
-            # Usar o menor valor entre histórico ajustado e teórico para ser conservador
-            energia_estimada = min(energia_estimada, producao_teorica)
-            
-            # Criar registro de previsão
-            previsao = {
+        return [
+            {
                 **day_forecast,
                 'energia_estimada': energia_estimada,
-                'fator_climatico': round(fator_climatico * 100, 1),
-                'mensagem': cls._gerar_mensagem(energia_estimada, fator_climatico, media_historica)
+                'fator_climatico': percentual,
+                'mensagem': cls._gerar_mensagem(energia_estimada, fator_climatico, referencia)
             }
-            
-            previsoes.append(previsao)
-            
-        return previsoes
+            for day_forecast, fator_climatico, energia_estimada, percentual
+            in zip(forecast, fatores, energias, percentuais)
+        ]
+    
+    @staticmethod
+    def _arredondar(valores, casas):
+        """
+        Arredonda um array exatamente como round() do Python
+        
+        np.round multiplica pela escala antes de arredondar, o que pode mudar o
+        resultado de valores muito próximos do meio-termo; esses poucos valores
+        são arredondados individualmente.
+        """
+        valores = np.asarray(valores, dtype='float64')
+        arredondados = np.round(valores, casas)
+        escalados = np.abs(valores * 10.0 ** casas)
+        ambiguos = np.abs(escalados - np.floor(escalados) - 0.5) < 1e-6
+        if ambiguos.any():
+            arredondados[ambiguos] = [round(valor, casas) for valor in valores[ambiguos].tolist()]
+        return arredondados
     
     @classmethod
-    def _calcular_fator_climatico(cls, weather_data):
+    def calcular_fatores_climaticos(cls, tabela):
         """
-        Calcula o fator de ajuste baseado nas condições climáticas
-        Retorna um valor entre 0 (sem geração) e 1 (condições ideais)
+        Calcula o fator de ajuste pelas condições climáticas de cada dia
+        
+        Cada condição é normalizada entre 0 e 1 e ponderada por WEATHER_WEIGHTS;
+        o fator vai de 0 (sem geração) a 1 (condições ideais).
+        
+        Args:
+            tabela: dict de arrays ou DataFrame com as colunas uvi, clouds, rain,
+                pop e daylight_hours (qualquer formato, ex.: fontes x dias)
+                
+        Returns:
+            ndarray: Fatores entre 0 e 1, no formato das colunas
         """
-        # Normalizar valores
-        uvi_norm = min(weather_data['uvi'] / cls.IDEAL_CONDITIONS['uvi'], 1.0)
-        clouds_norm = 1.0 - (weather_data['clouds'] / 100)  # Inverter: menos nuvens = melhor
-        rain_norm = 1.0 if weather_data['rain'] == 0 else max(0.0, 1.0 - (weather_data['rain'] / 25.0))
-        pop_norm = 1.0 - (weather_data['pop'] / 100)
-        daylight_norm = min(weather_data['daylight_hours'] / cls.IDEAL_CONDITIONS['daylight_hours'], 1.0)
+        uvi = np.asarray(tabela['uvi'], dtype='float64')
+        clouds = np.asarray(tabela['clouds'], dtype='float64')
+        rain = np.asarray(tabela['rain'], dtype='float64')
+        pop = np.asarray(tabela['pop'], dtype='float64')
+        daylight_hours = np.asarray(tabela['daylight_hours'], dtype='float64')
+        
+        # Mesmas operações, na mesma ordem, do cálculo original por dia
+        uvi_norm = np.minimum(uvi / cls.IDEAL_CONDITIONS['uvi'], 1.0)
+        clouds_norm = 1.0 - (clouds / 100)
+        rain_norm = np.where(rain == 0, 1.0, np.maximum(0.0, 1.0 - (rain / 25.0)))
+        pop_norm = 1.0 - (pop / 100)
+        daylight_norm = np.minimum(daylight_hours / cls.IDEAL_CONDITIONS['daylight_hours'], 1.0)
         
-        # Aplicar pesos
         fator = (
             cls.WEATHER_WEIGHTS['uvi'] * uvi_norm +
             cls.WEATHER_WEIGHTS['clouds'] * clouds_norm +
@@ -202,8 +505,44 @@ class GenerationForecaster:
             cls.WEATHER_WEIGHTS['daylight_hours'] * daylight_norm
         )
         
-        # Garantir que o fator esteja entre 0 e 1
-        return max(0.0, min(1.0, fator))
+        return np.maximum(0.0, np.minimum(1.0, fator))
+    
+    @classmethod
+    def estimar_energia(cls, tabela, capacidade, media_historica=None):
+        """
+        Calcula fatores climáticos e energia estimada de uma tabela fontes x dias
+        
+        Sem histórico a estimativa é capacidade x HORAS_SOL_PLENO x fator; com
+        histórico é a média histórica x fator, limitada à produção teórica.
+        Os resultados são idênticos aos do cálculo dia a dia original
+        (verificado por verificar_previsao.py).
+        
+        Args:
+            tabela: Condições climáticas (ver calcular_fatores_climaticos)
+            capacidade: Capacidade nominal em kWp (escalar ou array compatível, ex.: fontes x 1)
+            media_historica: Média diária histórica em kWh (NaN/None = sem histórico)
+            
+        Returns:
+            dict: Arrays 'fator_climatico' e 'energia_estimada'
+        """
+        fatores = cls.calcular_fatores_climaticos(tabela)
+        capacidade = np.asarray(capacidade, dtype='float64')
+        producao_teorica = capacidade * cls.HORAS_SOL_PLENO * fatores
+        
+        if media_historica is None:
+            media_historica = np.nan
+        media_historica = np.asarray(media_historica, dtype='float64')
+        
+        # Com histórico: o menor valor entre histórico ajustado e teórico (conservador)
+        energia_historica = np.minimum(cls._arredondar(media_historica * fatores, 2), producao_teorica)
+        energia_estimada = np.where(np.isnan(media_historica),
+                                    cls._arredondar(producao_teorica, 2),
+                                    energia_historica)
+        
+        return {
+            'fator_climatico': np.broadcast_to(fatores, energia_estimada.shape),
+            'energia_estimada': energia_estimada
+        }
     
     @classmethod
     def _gerar_mensagem(cls, energia_estimada, fator_climatico, referencia):
@@ -218,8 +557,8 @@ class GenerationForecaster:
             return f"Condições desfavoráveis para geração solar. Recomenda-se economizar energia."
     
     @classmethod
-    def _salvar_previsao(cls, fonte_id, previsoes):
-        """Salva a previsão em um arquivo JSON"""
+    def _salvar_previsao(cls, fonte_id, previsoes, simulada=False):
+        """Salva a previsão em um arquivo JSON (simulada=True marca o fallback sem API de clima)"""
         try:
             # Preparar dados para salvar
             dados = {
@@ -227,11 +566,21 @@ class GenerationForecaster:
                 'data_previsao': datetime.now().isoformat(),
                 'previsoes': previsoes
             }
+            if simulada:
+                dados['is_simulated'] = True
             
-            # Salvar arquivo
+            # Salvar em arquivo temporário e substituir o atual de uma vez,
+            # para que leitores concorrentes nunca vejam um arquivo parcial
+            os.makedirs(cls.FORECAST_DIR, exist_ok=True)
             arquivo = os.path.join(cls.FORECAST_DIR, f'previsao_fonte_{fonte_id}.json')
-            with open(arquivo, 'w') as f:
-                json.dump(dados, f, indent=2)
+            temporario = f'{arquivo}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(temporario, 'w') as f:
+                    json.dump(dados, f, indent=2)
+                os.replace(temporario, arquivo)
+            finally:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
                 
             return True
         except Exception as e:
@@ -239,15 +588,15 @@ class GenerationForecaster:
             return False
     
     @classmethod
-    def get_saved_forecast(cls, fonte_id):
+    def load_saved_forecast(cls, fonte_id):
         """
-        Obtém a previsão salva para uma fonte
+        Obtém a última previsão salva para uma fonte, qualquer que seja a idade
         
         Args:
             fonte_id (int): ID da fonte de energia
             
         Returns:
-            dict: Dados de previsão ou None se não houver previsão salva
+            dict: Dados de previsão com 'idade' (segundos) ou None se não houver previsão salva
         """
         arquivo = os.path.join(cls.FORECAST_DIR, f'previsao_fonte_{fonte_id}.json')
         
@@ -258,18 +607,204 @@ class GenerationForecaster:
             with open(arquivo, 'r') as f:
                 dados = json.load(f)
                 
-            # Verificar se a previsão não está desatualizada (máx. 12h)
             data_previsao = datetime.fromisoformat(dados['data_previsao'])
-            agora = datetime.now()
-            
-            if (agora - data_previsao).total_seconds() > 12 * 3600:
-                # Previsão desatualizada, gerar nova
-                return None
-                
+            dados['idade'] = int((datetime.now() - data_previsao).total_seconds())
             return dados
         except Exception as e:
             print(f"Erro ao ler previsão salva: {str(e)}")
             return None
+    
+    @classmethod
+    def get_saved_forecast(cls, fonte_id):
+        """
+        Obtém a previsão salva para uma fonte
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            
+        Returns:
+            dict: Dados de previsão ou None se não houver previsão salva
+        """
+        dados = cls.load_saved_forecast(fonte_id)
+        
+        # Verificar se a previsão não está desatualizada (máx. 12h)
+        if dados is None or dados['idade'] > cls.FORECAST_MAX_AGE:
+            return None
+            
+        return dados
+    
+    @classmethod
+    def get_forecast_stale_while_revalidate(cls, fonte_id, days=5):
+        """
+        Obtém a previsão sem esperar pela API de clima
+        
+        Responde com a última previsão salva, mesmo desatualizada, e agenda a
+        regeneração em segundo plano quando ela estiver próxima de expirar.
+        Sem nenhuma previsão salva, responde com uma previsão simulada, que é
+        salva para as próximas requisições enquanto a real é gerada; ela é
+        regenerada após FORECAST_SIMULATED_TTL.
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            days (int): Número de dias para previsão
+            
+        Returns:
+            dict: Dados de previsão com 'is_stale', 'is_simulated' e 'refreshing',
+                ou None se a fonte não existir
+        """
+        dados = cls.load_saved_forecast(fonte_id)
+        
+        if dados is None:
+            fonte = FonteEnergiaRepository.buscar_por_id(fonte_id)
+            if not fonte:
+                return None
+            previsoes = cls._generate_simulated_forecast(fonte, days)
+            cls._salvar_previsao(fonte_id, previsoes, simulada=True)
+            dados = {
+                'fonte_id': fonte_id,
+                'data_previsao': datetime.now().isoformat(),
+                'previsoes': previsoes,
+                'idade': 0,
+                'is_simulated': True
+            }
+            precisa_atualizar = True
+        else:
+            precisa_atualizar = cls._precisa_atualizar(dados)
+        
+        dados['is_stale'] = dados['idade'] > cls.FORECAST_MAX_AGE
+        dados['refreshing'] = cls.schedule_refresh(fonte_id, days) if precisa_atualizar else cls.is_refreshing(fonte_id)
+        return dados
+    
+    @classmethod
+    def _precisa_atualizar(cls, dados):
+        """Indica se uma previsão salva deve ser regenerada (simuladas têm validade menor)"""
+        if dados is None:
+            return True
+        validade = cls.FORECAST_SIMULATED_TTL if dados.get('is_simulated') else cls.FORECAST_REFRESH_AGE
+        return dados['idade'] > validade
+    
+    @classmethod
+    def _get_refresh_executor(cls):
+        """Pool de threads das atualizações em segundo plano (criado sob demanda)"""
+        with cls._refresh_lock:
+            if cls._refresh_executor is None:
+                cls._refresh_executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get('FORECAST_REFRESH_WORKERS', '4')),
+                    thread_name_prefix='forecast-refresh'
+                )
+            return cls._refresh_executor
+    
+    @classmethod
+    def is_refreshing(cls, fonte_id):
+        """Indica se há uma atualização em segundo plano pendente para a fonte"""
+        with cls._refresh_lock:
+            return fonte_id in cls._refresh_pending
+    
+    @classmethod
+    def schedule_refresh(cls, fonte_id, days=5):
+        """
+        Agenda a regeneração da previsão de uma fonte em segundo plano
+        
+        Args:
+            fonte_id (int): ID da fonte de energia
+            days (int): Número de dias para previsão
+            
+        Returns:
+            bool: True se há uma atualização pendente (agendada agora ou antes)
+        """
+        with cls._refresh_lock:
+            if fonte_id in cls._refresh_pending:
+                return True
+            cls._refresh_pending.add(fonte_id)
+        
+        try:
+            cls._get_refresh_executor().submit(cls._refresh, fonte_id, days)
+        except RuntimeError as e:
+            # Pool encerrado (fim do processo)
+            print(f"Erro ao agendar atualização da previsão: {str(e)}")
+            with cls._refresh_lock:
+                cls._refresh_pending.discard(fonte_id)
+            return False
+        return True
+    
+    @classmethod
+    def _refresh(cls, fonte_id, days):
+        """Regenera a previsão de uma fonte (executado no pool de atualização)"""
+        try:
+            previsoes = cls.regenerate_forecast(fonte_id, days)
+            
+            # Sem previsão real, renovar o fallback simulado salvo: a próxima
+            # tentativa só ocorre após FORECAST_SIMULATED_TTL. Os valores já
+            # exibidos são mantidos enquanto começarem no dia atual
+            if not previsoes or any(p.get('source') == 'simulado' for p in previsoes):
+                dados = cls.load_saved_forecast(fonte_id)
+                if dados is None or dados.get('is_simulated'):
+                    hoje = datetime.now().strftime('%Y-%m-%d')
+                    if dados and dados['previsoes'] and dados['previsoes'][0].get('date') == hoje:
+                        previsoes = dados['previsoes']
+                    elif not previsoes:
+                        fonte = FonteEnergiaRepository.buscar_por_id(fonte_id)
+                        previsoes = cls._generate_simulated_forecast(fonte, days) if fonte else None
+                    if previsoes:
+                        cls._salvar_previsao(fonte_id, previsoes, simulada=True)
+        except Exception as e:
+            print(f"Erro ao atualizar previsão da fonte {fonte_id}: {str(e)}")
+        finally:
+            with cls._refresh_lock:
+                cls._refresh_pending.discard(fonte_id)
+    
+    @classmethod
+    def refresh_due_forecasts(cls, days=5):
+        """
+        Regenera as previsões ausentes ou próximas de expirar de todas as fontes
+        
+        Returns:
+            dict: Relatório de predict_fleet ou None se nenhuma previsão precisou ser regenerada
+        """
+        pendentes = []
+        for fonte in FonteEnergiaRepository.listar_objetos():
+            if cls._precisa_atualizar(cls.load_saved_forecast(fonte.id)) and not cls.is_refreshing(fonte.id):
+                pendentes.append(fonte.id)
+                
+        if not pendentes:
+            return None
+        return cls.predict_fleet(days=days, fonte_ids=pendentes)
+    
+    @classmethod
+    def start_prewarmer(cls, intervalo=None):
+        """
+        Inicia a thread que mantém as previsões de todas as fontes atualizadas
+        
+        Args:
+            intervalo (int): Segundos entre as verificações (padrão: FORECAST_PREWARM_INTERVAL, 0 desativa)
+            
+        Returns:
+            bool: True se a thread está em execução
+        """
+        if intervalo is None:
+            intervalo = int(os.environ.get('FORECAST_PREWARM_INTERVAL', '900'))
+        if intervalo <= 0:
+            return False
+            
+        with cls._refresh_lock:
+            if cls._prewarmer is not None and cls._prewarmer.is_alive():
+                return True
+            cls._prewarmer = threading.Thread(target=cls._executar_prewarmer, args=(intervalo,),
+                                              name='forecast-prewarmer', daemon=True)
+            cls._prewarmer.start()
+        return True
+    
+    @classmethod
+    def _executar_prewarmer(cls, intervalo):
+        while True:
+            try:
+                relatorio = cls.refresh_due_forecasts()
+                if relatorio:
+                    print(f"Previsões atualizadas em segundo plano: {relatorio['previsoes_salvas']} "
+                          f"de {relatorio['fontes']} fontes em {relatorio['tempo_total_s']}s")
+            except Exception as e:
+                print(f"Erro na atualização das previsões: {str(e)}")
+            time.sleep(intervalo)
             
     @classmethod
     def clear_forecast(cls, fonte_id):
@@ -294,6 +829,22 @@ class GenerationForecaster:
             print(f"Erro ao remover previsão: {str(e)}")
             return False
     
+    @classmethod
+    def get_weather_cache_age(cls, previsoes):
+        """
+        Idade (em segundos) dos dados meteorológicos usados nas previsões
+        
+        Args:
+            previsoes (list): Previsões geradas por predict_generation
+            
+        Returns:
+            int: Segundos desde a consulta à API de clima ou None (dados simulados)
+        """
+        consultas = [p['weather_fetched_at'] for p in previsoes if p.get('weather_fetched_at')]
+        if not consultas:
+            return None
+        return int((datetime.now() - datetime.fromisoformat(min(consultas))).total_seconds())
+    
     @classmethod
     def _generate_simulated_forecast(cls, fonte, days=5):
         """
@@ -0,0 +1,603 @@
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+
+# Lock de arquivo entre processos (fcntl em POSIX, msvcrt no Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Importações condicionais e tardias (carregadas no primeiro uso) para permitir execução mesmo sem todas as dependências
+from app.importacao import importar_tardio
+try:
+    pd = importar_tardio('pandas')
+    np = importar_tardio('numpy')
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+from app.data_processors.rollups import Rollups, NS_POR_DIA, NS_POR_HORA
+
+class ColumnarStore:
+    """
+    Armazenamento colunar das séries temporais de cada fonte
+
+    Cada fonte possui um diretório com uma partição por mês (AAAA-MM.npz).
+    Cada partição guarda as colunas tipadas em arrays NumPy, ordenadas por
+    data_hora, o que permite ler apenas os meses e as linhas de um intervalo.
+
+    Os dados simulados ficam em um conjunto separado de partições e
+    agregações (subdiretório simulado/), de modo que gerar dados simulados
+    nunca sobrescreve leituras reais importadas.
+
+    As gravações de uma fonte (ler, mesclar e reescrever partições e
+    agregações) são serializadas por um lock da fonte, válido entre threads
+    e entre processos; as leituras não bloqueiam, pois cada arquivo é
+    substituído de forma atômica.
+    """
+
+    # Diretório raiz do armazenamento colunar
+    STORE_DIR = os.path.join('data', 'store')
+
+    # Diretórios dos arquivos CSV do formato antigo
+    LEGACY_PROCESSED_DIR = os.path.join('data', 'processed')
+    LEGACY_SIMULATED_DIR = os.path.join('data', 'simulated')
+    LEGACY_MIGRATED_DIR = os.path.join('data', 'processed', 'migrados')
+
+    # Esquema canônico das leituras (importação, armazenamento e controladores):
+    # medições em float32 (precisão de sobra para leituras de inversor) e
+    # fonte_id em int32, metade da memória dos tipos padrão do pandas
+    COLUNAS = {
+        'potencia_kw': 'float32',
+        'energia_kwh': 'float32',
+        'temperatura_inversor': 'float32',
+    }
+    TIPO_FONTE_ID = 'int32'
+
+    PARTICAO_REGEX = re.compile(r'^(\d{4})-(\d{2})\.npz$')
+
+    # Arquivo de lock (no diretório da fonte) das gravações entre processos
+    ARQUIVO_LOCK = '.lock'
+
+    _locks_fonte = {}  # fonte_id -> threading.Lock
+    _locks_fonte_lock = threading.Lock()
+
+    # Subdiretório (dentro do diretório da fonte) com os dados simulados
+    SUBDIR_SIMULADO = 'simulado'
+
+    # Tabelas de agregação mantidas a cada gravação
+    ROLLUPS = {
+        'diario': ('diario.npz', NS_POR_DIA),
+        'horario': ('horario.npz', NS_POR_HORA),
+    }
+
+    @classmethod
+    def diretorio_fonte(cls, fonte_id, simulado=False):
+        """Diretório com as partições de uma fonte (reais ou simuladas)"""
+        diretorio = os.path.join(cls.STORE_DIR, f'fonte_{fonte_id}')
+        return os.path.join(diretorio, cls.SUBDIR_SIMULADO) if simulado else diretorio
+
+    @classmethod
+    def _caminho_particao(cls, fonte_id, ano, mes, simulado=False):
+        """Caminho do arquivo de uma partição mensal"""
+        return os.path.join(cls.diretorio_fonte(fonte_id, simulado), f'{ano:04d}-{mes:02d}.npz')
+
+    @classmethod
+    def listar_particoes(cls, fonte_id, inicio=None, fim=None, simulado=False):
+        """
+        Lista as partições de uma fonte que podem conter dados no intervalo
+
+        Args:
+            fonte_id (int): ID da fonte de energia
+            inicio (datetime): Início do intervalo (inclusivo) ou None
+            fim (datetime): Fim do intervalo (inclusivo) ou None
+            simulado (bool): Lista as partições de dados simulados
+
+        Returns:
+            list: Caminhos das partições em ordem cronológica
+        """
+        diretorio = cls.diretorio_fonte(fonte_id, simulado)
+        if not os.path.exists(diretorio):
+            return []
+
+        mes_inicio = (inicio.year, inicio.month) if inicio is not None else None
+        mes_fim = (fim.year, fim.month) if fim is not None else None
+
+        particoes = []
+        for nome in sorted(os.listdir(diretorio)):
+            match = cls.PARTICAO_REGEX.match(nome)
+            if not match:
+                continue
+            mes = (int(match.group(1)), int(match.group(2)))
+            # Descartar partições fora do intervalo sem abri-las
+            if mes_inicio is not None and mes < mes_inicio:
+                continue
+            if mes_fim is not None and mes > mes_fim:
+                continue
+            particoes.append(os.path.join(diretorio, nome))
+
+        return particoes
+
+    @classmethod
+    def possui_dados(cls, fonte_id, simulado=False):
+        """Verifica se a fonte possui dados reais (ou simulados) armazenados ou CSVs antigos a migrar"""
+        return bool(cls.listar_particoes(fonte_id, simulado=simulado)) or bool(cls._listar_csv_legados(fonte_id, simulado))
+
+    @classmethod
+    def versao(cls, fonte_id):
+        """
+        Retorna a versão atual dos dados de uma fonte
+
+        A versão é formada pelo conjunto de partições com seus mtimes e
+        tamanhos (e pelos CSVs antigos ainda não migrados), reais e
+        simuladas, portanto muda a cada gravação.
+
+        Returns:
+            tuple: Identificador da versão dos dados
+        """
+        arquivos = []
+        for simulado in (False, True):
+            arquivos += cls.listar_particoes(fonte_id, simulado=simulado) + cls._listar_csv_legados(fonte_id, simulado)
+            arquivos += [os.path.join(cls.diretorio_fonte(fonte_id, simulado), arquivo)
+                         for arquivo, _ in cls.ROLLUPS.values()]
+        versao = []
+        for caminho in arquivos:
+            try:
+                info = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            versao.append((caminho, info.st_mtime_ns, info.st_size))
+        return tuple(versao)
+
+    @classmethod
+    def _get_lock_fonte(cls, fonte_id):
+        """Lock por fonte entre as threads do processo"""
+        with cls._locks_fonte_lock:
+            return cls._locks_fonte.setdefault(fonte_id, threading.Lock())
+
+    @classmethod
+    @contextmanager
+    def bloquear_fonte(cls, fonte_id):
+        """
+        Garante acesso exclusivo às gravações de uma fonte
+
+        Combina o lock da fonte entre threads com um lock no arquivo .lock do
+        diretório da fonte, que serializa também gravações de outros processos
+        (workers, scripts de importação).
+
+        Args:
+            fonte_id (int): ID da fonte de energia
+        """
+        with cls._get_lock_fonte(fonte_id):
+            diretorio = cls.diretorio_fonte(fonte_id)
+            os.makedirs(diretorio, exist_ok=True)
+            with open(os.path.join(diretorio, cls.ARQUIVO_LOCK), 'a+b') as arquivo:
+                if fcntl is not None:
+                    fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+                else:
+                    arquivo.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            # LK_LOCK desiste após ~10s: continuar aguardando
+                            continue
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+                    else:
+                        arquivo.seek(0)
+                        msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @classmethod
+    def _ler_particao(cls, caminho):
+        """Lê uma partição e retorna um dicionário de arrays"""
+        with np.load(caminho) as dados:
+            return {nome: dados[nome] for nome in dados.files}
+
+    @classmethod
+    def _escrever_particao(cls, caminho, colunas):
+        """Grava uma partição de forma atômica (arquivo temporário + rename)"""
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        # Nome temporário exclusivo do processo/thread: gravações nunca compartilham o arquivo
+        temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(temporario, 'wb') as f:
+                np.savez(f, **colunas)
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+    @classmethod
+    def _normalizar(cls, df):
+        """Converte um DataFrame para o dicionário de colunas tipadas do armazenamento"""
+        data_hora = pd.to_datetime(df['data_hora']).to_numpy(dtype='datetime64[ns]')
+        colunas = {'data_hora': data_hora.astype('int64')}
+        for nome, dtype in cls.COLUNAS.items():
+            if nome in df.columns:
+                colunas[nome] = pd.to_numeric(df[nome], errors='coerce').to_numpy(dtype=dtype)
+            else:
+                colunas[nome] = np.full(len(df), np.nan, dtype=dtype)
+        return colunas
+
+    @classmethod
+    def _tipar(cls, colunas):
+        """Converte as medições de uma partição para os tipos do esquema (partições antigas usam float64)"""
+        return {nome: valores.astype(cls.COLUNAS[nome], copy=False) if nome in cls.COLUNAS else valores
+                for nome, valores in colunas.items()}
+
+    @classmethod
+    def aplicar_esquema(cls, df, fonte_id=None):
+        """
+        Converte um DataFrame de leituras para o esquema canônico
+
+        Args:
+            df (DataFrame): Leituras com data_hora e colunas de medição
+            fonte_id (int): Atribui o ID da fonte a todas as linhas (opcional)
+
+        Returns:
+            DataFrame: Medições em float32 e fonte_id em int32
+        """
+        if fonte_id is not None:
+            df['fonte_id'] = fonte_id
+        tipos = {nome: dtype for nome, dtype in cls.COLUNAS.items() if nome in df.columns}
+        if 'fonte_id' in df.columns:
+            tipos['fonte_id'] = cls.TIPO_FONTE_ID
+        return df.astype(tipos, copy=False)
+
+    @staticmethod
+    def dias(data_hora):
+        """
+        Converte datas em buckets diários inteiros
+
+        Substitui data_hora.dt.date, que cria um objeto date por linha.
+
+        Args:
+            data_hora (Series ou ndarray): Datas (datetime64)
+
+        Returns:
+            ndarray: Dias desde 1970-01-01 (int32)
+        """
+        data_hora = np.asarray(data_hora, dtype='datetime64[ns]').astype('int64')
+        return (data_hora // NS_POR_DIA).astype('int32')
+
+    @staticmethod
+    def _ultimas_ocorrencias(colunas):
+        """Ordena as colunas por data_hora e mantém apenas a última ocorrência de cada instante"""
+        ordem = np.argsort(colunas['data_hora'], kind='stable')
+        colunas = {nome: valores[ordem] for nome, valores in colunas.items()}
+        data_hora = colunas['data_hora']
+        ultimo = np.append(data_hora[1:] != data_hora[:-1], True)
+        if ultimo.all():
+            return colunas
+        return {nome: valores[ultimo] for nome, valores in colunas.items()}
+
+    @classmethod
+    def _mesclar(cls, existentes, novos):
+        """
+        Mescla as linhas novas em uma partição pela chave data_hora
+
+        Returns:
+            tuple: (partição resultante, inseridos, atualizados, ignorados)
+        """
+        data_hora = existentes['data_hora']
+        posicoes = np.searchsorted(data_hora, novos['data_hora'])
+        encontrados = posicoes < len(data_hora)
+        encontrados[encontrados] = data_hora[posicoes[encontrados]] == novos['data_hora'][encontrados]
+
+        # Linhas já existentes: atualizar apenas as que mudaram algum valor
+        alvo = posicoes[encontrados]
+        diferentes = np.zeros(len(alvo), dtype=bool)
+        for nome in cls.COLUNAS:
+            antigo = existentes[nome][alvo]
+            novo = novos[nome][encontrados]
+            diferentes |= ~((antigo == novo) | (np.isnan(antigo) & np.isnan(novo)))
+
+        atualizados = int(diferentes.sum())
+        ignorados = len(alvo) - atualizados
+        if atualizados:
+            existentes = {nome: valores.copy() for nome, valores in existentes.items()}
+            for nome in cls.COLUNAS:
+                existentes[nome][alvo[diferentes]] = novos[nome][encontrados][diferentes]
+
+        # Linhas novas: inserir e reordenar
+        inseridos = int((~encontrados).sum())
+        if inseridos:
+            particao = {nome: np.concatenate([existentes[nome], novos[nome][~encontrados]])
+                        for nome in existentes}
+            ordem = np.argsort(particao['data_hora'], kind='stable')
+            existentes = {nome: valores[ordem] for nome, valores in particao.items()}
+
+        return existentes, inseridos, atualizados, ignorados
+
+    @classmethod
+    def gravar(cls, fonte_id, df, substituir=False, simulado=False):
+        """
+        Grava dados de uma fonte nas partições mensais correspondentes
+
+        As linhas são mescladas pela chave (fonte_id, data_hora): instantes
+        novos são inseridos, instantes existentes com valores diferentes são
+        atualizados e instantes idênticos são ignorados.
+
+        Args:
+            fonte_id (int): ID da fonte de energia
+            df (DataFrame): Dados com data_hora e colunas de medição
+            substituir (bool): Remove os dados existentes no intervalo coberto
+                por df antes de gravar (usado pelos dados simulados)
+            simulado (bool): Grava no conjunto de dados simulados; os dados
+                reais nunca são alterados por uma gravação simulada
+
+        Returns:
+            dict: Quantidade de registros inseridos, atualizados e ignorados
+        """
+        if df is None or df.empty:
+            return {'inseridos': 0, 'atualizados': 0, 'ignorados': 0}
+
+        with cls.bloquear_fonte(fonte_id):
+            return cls._gravar(fonte_id, df, substituir, simulado)
+
+    @classmethod
+    def _gravar(cls, fonte_id, df, substituir=False, simulado=False):
+        """Grava os dados de uma fonte (chamar com o lock da fonte adquirido)"""
+        resultado = {'inseridos': 0, 'atualizados': 0, 'ignorados': 0}
+
+        novos = cls._normalizar(df)
+        # Duplicações dentro do próprio lote: vale a última linha
+        total = len(novos['data_hora'])
+        novos = cls._ultimas_ocorrencias(novos)
+        resultado['ignorados'] += total - len(novos['data_hora'])
+
+        datas = novos['data_hora'].astype('datetime64[ns]')
+        # Chave mensal (AAAA*12 + mês) para agrupar as linhas por partição
+        anos = datas.astype('datetime64[Y]').astype(int) + 1970
+        meses = datas.astype('datetime64[M]').astype(int) % 12 + 1
+        chaves = anos * 12 + (meses - 1)
+
+        inicio_novos = novos['data_hora'].min()
+        fim_novos = novos['data_hora'].max()
+        alteradas = []
+
+        for chave in np.unique(chaves):
+            mascara = chaves == chave
+            ano, mes = divmod(int(chave), 12)
+            caminho = cls._caminho_particao(fonte_id, ano, mes + 1, simulado)
+
+            particao = {nome: valores[mascara] for nome, valores in novos.items()}
+
+            if os.path.exists(caminho):
+                # Partições antigas podem conter duplicações gravadas antes da mesclagem
+                existentes = cls._ultimas_ocorrencias(cls._tipar(cls._ler_particao(caminho)))
+                if substituir:
+                    manter = ((existentes['data_hora'] < inicio_novos) |
+                              (existentes['data_hora'] > fim_novos))
+                    existentes = {nome: valores[manter] for nome, valores in existentes.items()}
+                particao, inseridos, atualizados, ignorados = cls._mesclar(existentes, particao)
+                resultado['inseridos'] += inseridos
+                resultado['atualizados'] += atualizados
+                resultado['ignorados'] += ignorados
+                if not inseridos and not atualizados and not substituir:
+                    # Nada mudou: manter o arquivo (e a versão dos dados) intacto
+                    continue
+            else:
+                resultado['inseridos'] += len(particao['data_hora'])
+
+            cls._escrever_particao(caminho, particao)
+            alteradas.append((ano, mes + 1, particao))
+
+        if alteradas:
+            cls._atualizar_rollups(fonte_id, alteradas, simulado)
+
+        return resultado
+
+    @classmethod
+    def _caminho_rollup(cls, fonte_id, nivel, simulado=False):
+        """Caminho do arquivo de uma tabela de agregação ('diario' ou 'horario')"""
+        return os.path.join(cls.diretorio_fonte(fonte_id, simulado), cls.ROLLUPS[nivel][0])
+
+    @classmethod
+    def _atualizar_rollups(cls, fonte_id, particoes, simulado=False):
+        """
+        Recalcula as agregações dos meses alterados e as mescla nas tabelas da fonte
+
+        Args:
+            fonte_id (int): ID da fonte de energia
+            particoes (list): Tuplas (ano, mes, colunas) das partições gravadas
+            simulado (bool): Atualiza as agregações dos dados simulados
+        """
+        for nivel, (_, ns_por_bucket) in cls.ROLLUPS.items():
+            caminho = cls._caminho_rollup(fonte_id, nivel, simulado)
+            tabela = cls._ler_particao(caminho) if os.path.exists(caminho) else Rollups.vazia()
+
+            for ano, mes, colunas in particoes:
+                inicio_mes = np.datetime64(f'{ano:04d}-{mes:02d}', 'M')
+                limites = np.array([inicio_mes, inicio_mes + 1]).astype('datetime64[ns]').astype('int64')
+                tabela = Rollups.substituir_intervalo(
+                    tabela,
+                    Rollups.agregar(colunas, ns_por_bucket),
+                    limites[0] // ns_por_bucket,
+                    limites[1] // ns_por_bucket
+                )
+
+            cls._escrever_particao(caminho, tabela)
+
+    @classmethod
+    def reconstruir_rollups(cls, fonte_id, simulado=False):
+        """Recalcula as tabelas de agregação a partir de todas as partições da fonte"""
+        with cls.bloquear_fonte(fonte_id):
+            cls._reconstruir_rollups(fonte_id, simulado)
+
+    @classmethod
+    def _reconstruir_rollups(cls, fonte_id, simulado=False):
+        """Recalcula as agregações (chamar com o lock da fonte adquirido)"""
+        particoes = []
+        for caminho in cls.listar_particoes(fonte_id, simulado=simulado):
+            ano, mes = cls.PARTICAO_REGEX.match(os.path.basename(caminho)).groups()
+            particoes.append((int(ano), int(mes), cls._tipar(cls._ler_particao(caminho))))
+
+        for nivel in cls.ROLLUPS:
+            caminho = cls._caminho_rollup(fonte_id, nivel, simulado)
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+        if particoes:
+            cls._atualizar_rollups(fonte_id, particoes, simulado)
+
+    @classmethod
+    def carregar_rollup(cls, fonte_id, nivel, inicio=None, fim=None, simulado=False):
+        """
+        Carrega uma tabela de agregação da fonte
+
+        Args:
+            fonte_id (int): ID da fonte de energia
+            nivel (str): 'diario' ou 'horario'
+            inicio (datetime): Início do intervalo (inclusivo) ou None
+            fim (datetime): Fim do intervalo (inclusivo) ou None
+            simulado (bool): Lê as agregações dos dados simulados
+
+        Returns:
+            DataFrame: Uma linha por dia/hora com data_hora (início do bucket),
+            energia_kwh, potencia_max, potencia_media, amostras,
+            temperatura_max e ultima_leitura; None se não houver dados
+        """
+        if not PANDAS_AVAILABLE:
+            return None
+
+        cls.migrar_csv_legados(fonte_id)
+
+        caminho = cls._caminho_rollup(fonte_id, nivel, simulado)
+        if not os.path.exists(caminho):
+            # Dados gravados antes da existência das agregações
+            if not cls.listar_particoes(fonte_id, simulado=simulado):
+                return None
+            cls.reconstruir_rollups(fonte_id, simulado)
+
+        tabela = cls._ler_particao(caminho)
+        ns_por_bucket = cls.ROLLUPS[nivel][1]
+
+        esquerda = 0
+        direita = len(tabela['bucket'])
+        if inicio is not None:
+            esquerda = np.searchsorted(tabela['bucket'], pd.Timestamp(inicio).value // ns_por_bucket, side='left')
+        if fim is not None:
+            direita = np.searchsorted(tabela['bucket'], pd.Timestamp(fim).value // ns_por_bucket, side='right')
+        if direita <= esquerda:
+            return None
+
+        tabela = {nome: valores[esquerda:direita] for nome, valores in tabela.items()}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            potencia_media = tabela['potencia_soma'] / tabela['amostras']
+
+        return pd.DataFrame({
+            'data_hora': (tabela['bucket'] * ns_por_bucket).astype('datetime64[ns]'),
+            'energia_kwh': tabela['energia_kwh'],
+            'potencia_max': tabela['potencia_max'],
+            'potencia_media': potencia_media,
+            'amostras': tabela['amostras'],
+            'temperatura_max': tabela['temperatura_max'],
+            'ultima_leitura': tabela['ultima_leitura'].astype('datetime64[ns]'),
+        })
+
+    @classmethod
+    def carregar(cls, fonte_id, inicio=None, fim=None, simulado=False):
+        """
+        Carrega os dados de uma fonte, lendo apenas as partições do intervalo
+
+        Args:
+            fonte_id (int): ID da fonte de energia
+            inicio (datetime): Início do intervalo (inclusivo) ou None
+            fim (datetime): Fim do intervalo (inclusivo) ou None
+            simulado (bool): Lê os dados simulados em vez dos reais
+
+        Returns:
+            DataFrame: Dados ordenados por data_hora ou None se não houver dados
+        """
+        if not PANDAS_AVAILABLE:
+            return None
+
+        cls.migrar_csv_legados(fonte_id)
+
+        inicio_ns = pd.Timestamp(inicio).value if inicio is not None else None
+        fim_ns = pd.Timestamp(fim).value if fim is not None else None
+
+        blocos = []
+        for caminho in cls.listar_particoes(fonte_id, inicio, fim, simulado):
+            colunas = cls._tipar(cls._ler_particao(caminho))
+            # Partições são ordenadas: filtrar o intervalo por busca binária
+            esquerda = 0
+            direita = len(colunas['data_hora'])
+            if inicio_ns is not None:
+                esquerda = np.searchsorted(colunas['data_hora'], inicio_ns, side='left')
+            if fim_ns is not None:
+                direita = np.searchsorted(colunas['data_hora'], fim_ns, side='right')
+            if direita > esquerda:
+                blocos.append({nome: valores[esquerda:direita] for nome, valores in colunas.items()})
+
+        if not blocos:
+            return None
+
+        colunas = {nome: np.concatenate([bloco[nome] for bloco in blocos]) for nome in blocos[0]}
+        # Partições gravadas antes da mesclagem por chave podem ter duplicações
+        if not (np.diff(colunas['data_hora']) > 0).all():
+            colunas = cls._ultimas_ocorrencias(colunas)
+        df = pd.DataFrame({
+            'data_hora': colunas['data_hora'].astype('datetime64[ns]'),
+            **{nome: colunas[nome] for nome in cls.COLUNAS},
+        })
+        return cls.aplicar_esquema(df, fonte_id)
+
+    @classmethod
+    def _listar_csv_legados(cls, fonte_id, simulado=False):
+        """Lista os arquivos CSV do formato antigo de uma fonte (data/processed ou data/simulated)"""
+        arquivos = []
+        if simulado:
+            path_simulado = os.path.join(cls.LEGACY_SIMULATED_DIR, f'fonte_{fonte_id}_simulado.csv')
+            if os.path.exists(path_simulado):
+                arquivos.append(path_simulado)
+        elif os.path.exists(cls.LEGACY_PROCESSED_DIR):
+            arquivos.extend(
+                os.path.join(cls.LEGACY_PROCESSED_DIR, f)
+                for f in sorted(os.listdir(cls.LEGACY_PROCESSED_DIR))
+                if f.startswith(f'fonte_{fonte_id}_') and f.endswith('.csv')
+            )
+        return arquivos
+
+    @classmethod
+    def migrar_csv_legados(cls, fonte_id):
+        """
+        Migra os CSVs antigos (data/processed e data/simulated) para o armazenamento
+
+        Os arquivos migrados são movidos para data/processed/migrados, de modo
+        que a migração acontece uma única vez por arquivo. O CSV simulado vai
+        para o conjunto de dados simulados.
+
+        Returns:
+            int: Número de arquivos migrados
+        """
+        if not cls._listar_csv_legados(fonte_id) and not cls._listar_csv_legados(fonte_id, True):
+            return 0
+
+        with cls.bloquear_fonte(fonte_id):
+            # Listar novamente: outra thread/processo pode ter migrado os arquivos
+            arquivos = [(arquivo, simulado) for simulado in (False, True)
+                        for arquivo in cls._listar_csv_legados(fonte_id, simulado)]
+            os.makedirs(cls.LEGACY_MIGRATED_DIR, exist_ok=True)
+            migrados = 0
+            for arquivo, simulado in arquivos:
+                try:
+                    df = pd.read_csv(arquivo)
+                    df['data_hora'] = pd.to_datetime(df['data_hora'])
+                    cls._gravar(fonte_id, df, simulado=simulado)
+                    shutil.move(arquivo, os.path.join(cls.LEGACY_MIGRATED_DIR, os.path.basename(arquivo)))
+                    migrados += 1
+                except Exception as e:
+                    print(f"Erro ao migrar arquivo {arquivo}: {str(e)}")
+
+        return migrados
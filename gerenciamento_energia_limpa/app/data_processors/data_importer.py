@@ -1,10 +1,10 @@
-import os
 from datetime import datetime, timedelta
 
-# Importações condicionais para permitir execução mesmo sem todas as dependências
+# Importações condicionais e tardias (carregadas no primeiro uso) para permitir execução mesmo sem todas as dependências
+from app.importacao import importar_tardio
 try:
-    import pandas as pd
-    import numpy as np
+    pd = importar_tardio('pandas')
+    np = importar_tardio('numpy')
     PANDAS_AVAILABLE = True
 except ImportError:
     PANDAS_AVAILABLE = False
@@ -23,41 +23,69 @@ except ImportError:
             return 0.5
     np = MockNumpy()
 
+from app.data_processors.columnar_store import ColumnarStore
+
 class GrowattDataImporter:
     """Classe para importação de dados de inversores Growatt"""
     
+    # Número de linhas lidas por bloco na importação em streaming
+    TAMANHO_BLOCO_PADRAO = 50000
+    
     @staticmethod
-    def importar_csv(arquivo, fonte_id):
-        """Importa dados de um arquivo CSV exportado do Growatt"""
+    def importar_csv(arquivo, fonte_id, tamanho_bloco=None, progresso=None):
+        """
+        Importa dados de um arquivo CSV exportado do Growatt
+        
+        Args:
+            arquivo: Caminho ou objeto de arquivo com o CSV
+            fonte_id (int): ID da fonte de energia
+            tamanho_bloco (int): Se informado, lê e grava o arquivo em blocos
+                desse número de linhas, limitando o uso de memória
+            progresso (callable): Função chamada após cada bloco com um
+                dicionário (bloco, linhas_lidas, registros, rejeitados)
+                
+        Returns:
+            dict: Resultado com registros processados, linhas rejeitadas e a
+            quantidade de registros inseridos, atualizados e ignorados
+            (já existentes com os mesmos valores)
+        """
         if not PANDAS_AVAILABLE:
             return {
                 'sucesso': False,
                 'mensagem': 'Biblioteca pandas não está instalada. Instale-a com pip install pandas.',
                 'caminho_arquivo': None,
-                'registros': 0
+                'registros': 0,
+                'rejeitados': 0,
+                'inseridos': 0,
+                'atualizados': 0,
+                'ignorados': 0
             }
+        
+        if tamanho_bloco:
+            return GrowattDataImporter._importar_csv_em_blocos(arquivo, fonte_id, tamanho_bloco, progresso)
             
         try:
             # Leitura do arquivo CSV
             df = pd.read_csv(arquivo)
+            linhas_lidas = len(df)
             
             # Processamento e limpeza dos dados
             # Ajuste conforme o formato real dos seus arquivos Growatt
             df = GrowattDataImporter._processar_dados_csv(df)
             
-            # Associar ao ID da fonte
-            df['fonte_id'] = fonte_id
+            # Associar ao ID da fonte e converter para o esquema do armazenamento
+            df = ColumnarStore.aplicar_esquema(df, fonte_id)
             
-            # Salvar dados processados
-            os.makedirs('data/processed', exist_ok=True)
-            output_path = f'data/processed/fonte_{fonte_id}_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv'
-            df.to_csv(output_path, index=False)
+            # Mesclar os dados processados no armazenamento colunar
+            contagem = ColumnarStore.gravar(fonte_id, df)
             
             return {
                 'sucesso': True,
                 'mensagem': 'Dados importados com sucesso',
-                'caminho_arquivo': output_path,
-                'registros': len(df)
+                'caminho_arquivo': ColumnarStore.diretorio_fonte(fonte_id),
+                'registros': len(df),
+                'rejeitados': linhas_lidas - len(df),
+                **contagem
             }
             
         except Exception as e:
@@ -65,7 +93,60 @@ class GrowattDataImporter:
                 'sucesso': False,
                 'mensagem': f'Erro ao importar dados: {str(e)}',
                 'caminho_arquivo': None,
-                'registros': 0
+                'registros': 0,
+                'rejeitados': 0,
+                'inseridos': 0,
+                'atualizados': 0,
+                'ignorados': 0
+            }
+    
+    @staticmethod
+    def _importar_csv_em_blocos(arquivo, fonte_id, tamanho_bloco, progresso=None):
+        """Importa o CSV em blocos de tamanho fixo, gravando cada bloco ao ser processado"""
+        blocos = 0
+        linhas_lidas = 0
+        registros = 0
+        contagem = {'inseridos': 0, 'atualizados': 0, 'ignorados': 0}
+        
+        try:
+            with pd.read_csv(arquivo, chunksize=tamanho_bloco) as leitor:
+                for df in leitor:
+                    blocos += 1
+                    linhas_lidas += len(df)
+                    
+                    # Limpeza e gravação do bloco (memória limitada ao tamanho do bloco)
+                    df = GrowattDataImporter._processar_dados_csv(df)
+                    df = ColumnarStore.aplicar_esquema(df, fonte_id)
+                    for chave, valor in ColumnarStore.gravar(fonte_id, df).items():
+                        contagem[chave] += valor
+                    registros += len(df)
+                    
+                    if progresso:
+                        progresso({
+                            'bloco': blocos,
+                            'linhas_lidas': linhas_lidas,
+                            'registros': registros,
+                            'rejeitados': linhas_lidas - registros
+                        })
+            
+            return {
+                'sucesso': True,
+                'mensagem': f'Dados importados com sucesso ({blocos} blocos)',
+                'caminho_arquivo': ColumnarStore.diretorio_fonte(fonte_id),
+                'registros': registros,
+                'rejeitados': linhas_lidas - registros,
+                **contagem
+            }
+            
+        except Exception as e:
+            # Os blocos anteriores ao erro já foram gravados
+            return {
+                'sucesso': False,
+                'mensagem': f'Erro ao importar dados no bloco {blocos} ({registros} registros já gravados): {str(e)}',
+                'caminho_arquivo': ColumnarStore.diretorio_fonte(fonte_id) if registros else None,
+                'registros': registros,
+                'rejeitados': linhas_lidas - registros,
+                **contagem
             }
     
     @staticmethod
@@ -122,9 +203,80 @@ class GrowattDataImporter:
         
         return df
     
+    # Padrão diário de geração solar (0h-23h): 0 durante a noite, pico ao meio-dia
+    PADRAO_DIARIO = [0, 0, 0, 0, 0, 0, 0.1, 0.3, 0.5, 0.7, 0.8, 0.9,
+                     1.0, 0.9, 0.8, 0.7, 0.5, 0.3, 0.1, 0, 0, 0, 0, 0]
+    
+    # Fator sazonal por mês (janeiro a dezembro): mais produção no verão
+    FATOR_SAZONAL = [1.0, 1.0,          # Verão
+                     0.8, 0.8, 0.8,     # Outono
+                     0.7, 0.7, 0.7,     # Inverno
+                     0.9, 0.9, 0.9,     # Primavera
+                     1.0]               # Verão
+    
+    # Potência máxima da instalação de exemplo (kW)
+    POTENCIA_PICO_SIMULADA = 5.0
+    
+    @staticmethod
+    def gerar_serie_simulada(fonte_ids, inicio, fim, seed=None):
+        """
+        Gera a série simulada de uma ou mais fontes em uma única passagem vetorizada
+        
+        Args:
+            fonte_ids (int ou list): ID da fonte ou lista de IDs
+            inicio (datetime): Início do período
+            fim (datetime): Fim do período
+            seed (int): Semente do gerador aleatório para resultados reproduzíveis
+            
+        Returns:
+            DataFrame: Leituras a cada 15 minutos de todas as fontes, com as
+            colunas data_hora, potencia_kw, energia_kwh, temperatura_inversor e fonte_id
+            no esquema do armazenamento (ColumnarStore.aplicar_esquema)
+        """
+        if isinstance(fonte_ids, int):
+            fonte_ids = [fonte_ids]
+        
+        # Gerar timestamps em intervalos de 15 minutos
+        timestamps = pd.date_range(start=inicio, end=fim, freq='15min')
+        n_fontes = len(fonte_ids)
+        n_leituras = len(timestamps)
+        
+        # Potência base conforme hora do dia
+        padrao = np.asarray(GrowattDataImporter.PADRAO_DIARIO)[timestamps.hour]
+        potencia_base = padrao * GrowattDataImporter.POTENCIA_PICO_SIMULADA
+        
+        # Redução nos finais de semana e variação sazonal
+        fator_semana = np.where(timestamps.weekday >= 5, 0.8, 1.0)
+        fator_sazonal = np.asarray(GrowattDataImporter.FATOR_SAZONAL)[timestamps.month - 1]
+        fator = fator_semana * fator_sazonal
+        
+        # Variação aleatória (+/- 20%) independente para cada fonte e leitura
+        rng = np.random.default_rng(seed)
+        variacao = rng.uniform(-0.2, 0.2, size=(n_fontes, n_leituras))
+        potencia = np.maximum(0, potencia_base * (1 + variacao)) * fator
+        
+        # Energia (kWh) - integração da potência no tempo (15min = 0.25h)
+        energia = potencia * 0.25
+        temperatura = rng.uniform(25, 45, size=(n_fontes, n_leituras))
+        
+        return ColumnarStore.aplicar_esquema(pd.DataFrame({
+            'data_hora': np.tile(timestamps.to_numpy(), n_fontes),
+            'potencia_kw': np.round(potencia, 3).ravel(),
+            'energia_kwh': np.round(energia, 3).ravel(),
+            'temperatura_inversor': np.round(temperatura, 1).ravel(),
+            'fonte_id': np.repeat(np.asarray(fonte_ids), n_leituras)
+        }))
+    
     @staticmethod
-    def gerar_dados_simulados(fonte_id, dias=30):
-        """Gera dados simulados para desenvolvimento e testes"""
+    def gerar_dados_simulados(fonte_id, dias=30, seed=None):
+        """
+        Gera dados simulados para desenvolvimento e testes
+        
+        Args:
+            fonte_id (int ou list): ID da fonte ou lista de IDs (frota de teste)
+            dias (int): Número de dias até o momento atual (aceita vários anos)
+            seed (int): Semente do gerador aleatório (opcional)
+        """
         if not PANDAS_AVAILABLE:
             return {
                 'sucesso': False,
@@ -137,67 +289,21 @@ class GrowattDataImporter:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=dias)
         
-        # Gerar timestamps em intervalos de 15 minutos
-        timestamps = pd.date_range(start=start_date, end=end_date, freq='15T')
-        
-        # Dados base - padrão diário de geração solar (0h-23h)
-        # 0 durante a noite, pico durante o meio-dia
-        padrao_diario = [0, 0, 0, 0, 0, 0, 0.1, 0.3, 0.5, 0.7, 0.8, 0.9, 
-                         1.0, 0.9, 0.8, 0.7, 0.5, 0.3, 0.1, 0, 0, 0, 0, 0]
-        
-        # Criar DataFrame
-        data = []
+        fonte_ids = [fonte_id] if isinstance(fonte_id, int) else list(fonte_id)
+        df = GrowattDataImporter.gerar_serie_simulada(fonte_ids, start_date, end_date, seed)
         
-        for ts in timestamps:
-            hora = ts.hour
-            # Potência base conforme hora do dia (máximo 5kW para uma instalação de exemplo)
-            potencia_base = padrao_diario[hora] * 5.0
-            
-            # Adicionar variação aleatória (+/- 20%)
-            variacao = np.random.uniform(-0.2, 0.2)
-            potencia = max(0, potencia_base * (1 + variacao))
-            
-            # Fatores climáticos (simplificado)
-            # Redução nos finais de semana para simular diferenças
-            if ts.weekday() >= 5:  # Sábado e domingo
-                potencia *= 0.8
-            
-            # Variação sazonal (exemplo simplificado)
-            # Mais produção no verão
-            mes = ts.month
-            if 3 <= mes <= 5:  # Outono
-                fator_sazonal = 0.8
-            elif 6 <= mes <= 8:  # Inverno
-                fator_sazonal = 0.7
-            elif 9 <= mes <= 11:  # Primavera
-                fator_sazonal = 0.9
-            else:  # Verão
-                fator_sazonal = 1.0
-                
-            potencia *= fator_sazonal
-            
-            # Energia acumulada (kWh) - integração da potência no tempo (15min = 0.25h)
-            energia = potencia * 0.25
-            
-            data.append({
-                'data_hora': ts,
-                'potencia_kw': round(potencia, 3),
-                'energia_kwh': round(energia, 3),
-                'temperatura_inversor': round(np.random.uniform(25, 45), 1),
-                'fonte_id': fonte_id
-            })
-        
-        # Criar DataFrame
-        df = pd.DataFrame(data)
-        
-        # Salvar dados simulados
-        os.makedirs('data/simulated', exist_ok=True)
-        output_path = f'data/simulated/fonte_{fonte_id}_simulado.csv'
-        df.to_csv(output_path, index=False)
+        # Salvar no conjunto de dados simulados (substituindo o período simulado
+        # anteriormente); as leituras reais importadas não são alteradas
+        registros = 0
+        leituras_por_fonte = len(df) // len(fonte_ids) if fonte_ids else 0
+        for i, id_fonte in enumerate(fonte_ids):
+            df_fonte = df.iloc[i * leituras_por_fonte:(i + 1) * leituras_por_fonte]
+            ColumnarStore.gravar(id_fonte, df_fonte, substituir=True, simulado=True)
+            registros += len(df_fonte)
         
         return {
             'sucesso': True,
             'mensagem': 'Dados simulados gerados com sucesso',
-            'caminho_arquivo': output_path,
-            'registros': len(df)
+            'caminho_arquivo': ColumnarStore.diretorio_fonte(fonte_ids[0], simulado=True) if len(fonte_ids) == 1 else ColumnarStore.STORE_DIR,
+            'registros': registros
         }
\ No newline at end of file
@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+
+class DataFrameCache:
+    """
+    Cache em memória (por processo) dos DataFrames carregados do armazenamento
+
+    Cada entrada guarda a versão dos dados no momento da leitura (arquivos,
+    mtimes e tamanhos das partições). Uma entrada só é servida se a versão
+    atual ainda for a mesma; caso contrário é descartada e recarregada.
+    O uso de memória é limitado por MAX_BYTES, com descarte LRU.
+    """
+
+    # Limite de memória do cache (em MB), configurável por variável de ambiente
+    MAX_BYTES = int(os.environ.get('DATAFRAME_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+    _entradas = OrderedDict()  # chave -> (versao, df, tamanho)
+    _bytes = 0
+    _lock = threading.Lock()
+    _contadores = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def _tamanho(df):
+        """Memória ocupada por um DataFrame (em bytes)"""
+        return int(df.memory_usage(index=True, deep=True).sum())
+
+    @classmethod
+    def obter(cls, chave, versao):
+        """
+        Obtém um DataFrame do cache
+
+        Args:
+            chave: Chave da entrada (ex.: (fonte_id, inicio, fim))
+            versao: Versão atual dos dados da fonte
+
+        Returns:
+            DataFrame: Dados em cache ou None se ausentes/desatualizados
+        """
+        with cls._lock:
+            entrada = cls._entradas.get(chave)
+            if entrada is None or entrada[0] != versao:
+                if entrada is not None:
+                    # Versão desatualizada: liberar a memória imediatamente
+                    cls._remover(chave)
+                cls._contadores['misses'] += 1
+                return None
+
+            cls._entradas.move_to_end(chave)
+            cls._contadores['hits'] += 1
+            return entrada[1]
+
+    @classmethod
+    def armazenar(cls, chave, versao, df):
+        """Armazena um DataFrame no cache, descartando as entradas menos usadas se necessário"""
+        tamanho = cls._tamanho(df)
+        if tamanho > cls.MAX_BYTES:
+            # Maior que o cache inteiro: não vale a pena armazenar
+            return
+
+        with cls._lock:
+            if chave in cls._entradas:
+                cls._remover(chave)
+
+            cls._entradas[chave] = (versao, df, tamanho)
+            cls._bytes += tamanho
+
+            while cls._bytes > cls.MAX_BYTES and cls._entradas:
+                chave_antiga = next(iter(cls._entradas))
+                cls._remover(chave_antiga)
+                cls._contadores['evictions'] += 1
+
+    @classmethod
+    def _remover(cls, chave):
+        """Remove uma entrada (chamar com o lock adquirido)"""
+        _, _, tamanho = cls._entradas.pop(chave)
+        cls._bytes -= tamanho
+
+    @classmethod
+    def invalidar(cls, fonte_id=None):
+        """Remove as entradas de uma fonte (ou todas, se fonte_id for None)"""
+        with cls._lock:
+            for chave in list(cls._entradas):
+                if fonte_id is None or chave[0] == fonte_id:
+                    cls._remover(chave)
+
+    @classmethod
+    def estatisticas(cls):
+        """Retorna os contadores do cache para dimensionamento"""
+        with cls._lock:
+            total = cls._contadores['hits'] + cls._contadores['misses']
+            return {
+                **cls._contadores,
+                'hit_ratio': round(cls._contadores['hits'] / total, 4) if total else 0.0,
+                'entradas': len(cls._entradas),
+                'bytes': cls._bytes,
+                'max_bytes': cls.MAX_BYTES
+            }
+
+    @classmethod
+    def relatorio_memoria(cls):
+        """
+        Memória ocupada pelo cache por fonte, com o detalhamento por coluna
+
+        Returns:
+            dict: fonte_id -> entradas, linhas, bytes, bytes_por_linha e bytes
+            de cada coluna (somados entre as entradas da fonte)
+        """
+        with cls._lock:
+            entradas = [(chave[0], df, tamanho) for chave, (_, df, tamanho) in cls._entradas.items()]
+
+        # memory_usage(deep=True) fora do lock: os DataFrames em cache não são alterados
+        relatorio = {}
+        for fonte_id, df, tamanho in entradas:
+            fonte = relatorio.setdefault(fonte_id, {'entradas': 0, 'linhas': 0, 'bytes': 0, 'colunas': {}})
+            fonte['entradas'] += 1
+            fonte['linhas'] += len(df)
+            fonte['bytes'] += tamanho
+            for coluna, bytes_coluna in df.memory_usage(index=True, deep=True).items():
+                fonte['colunas'][coluna] = fonte['colunas'].get(coluna, 0) + int(bytes_coluna)
+
+        for fonte in relatorio.values():
+            fonte['bytes_por_linha'] = round(fonte['bytes'] / fonte['linhas'], 1) if fonte['linhas'] else 0.0
+        return relatorio
@@ -0,0 +1,61 @@
+# Importações condicionais e tardias (carregadas no primeiro uso) para permitir execução mesmo sem todas as dependências
+from app.importacao import importar_tardio
+try:
+    np = importar_tardio('numpy')
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+class Downsampling:
+    """Redução de séries temporais para exibição em gráficos"""
+
+    @staticmethod
+    def lttb(x, y, max_pontos):
+        """
+        Seleciona pontos de uma série pelo algoritmo Largest-Triangle-Three-Buckets
+
+        O primeiro e o último ponto são mantidos; os demais são divididos em
+        max_pontos - 2 grupos e, de cada grupo, é escolhido o ponto que forma o
+        maior triângulo com o ponto escolhido no grupo anterior e a média do
+        grupo seguinte, preservando picos e vales da série.
+
+        Args:
+            x (ndarray): Eixo x em ordem crescente (ex.: data_hora em ns)
+            y (ndarray): Valores da série
+            max_pontos (int): Quantidade máxima de pontos
+
+        Returns:
+            ndarray: Índices dos pontos selecionados, em ordem crescente
+        """
+        n = len(y)
+        if max_pontos >= n:
+            return np.arange(n)
+        if max_pontos < 3:
+            return np.array([0, n - 1][:max(max_pontos, 0)], dtype='int64')
+
+        # Eixo x relativo ao primeiro ponto (evita perda de precisão com ns desde 1970)
+        x = (np.asarray(x, dtype='int64') - int(x[0])).astype('float64')
+        y = np.nan_to_num(np.asarray(y, dtype='float64'))
+
+        # Limites dos grupos dos pontos internos [1, n - 1) e, ao final, o último ponto
+        tamanho = (n - 2) / (max_pontos - 2)
+        limites = np.append((np.arange(max_pontos - 1) * tamanho).astype('int64') + 1, n)
+
+        selecionados = np.empty(max_pontos, dtype='int64')
+        selecionados[0] = 0
+        selecionados[-1] = n - 1
+        anterior = 0
+        for i in range(max_pontos - 2):
+            inicio, fim = limites[i], limites[i + 1]
+            media_x = x[fim:limites[i + 2]].mean()
+            media_y = y[fim:limites[i + 2]].mean()
+
+            # Dobro da área dos triângulos (ponto anterior, candidato, média do grupo seguinte)
+            areas = np.abs(
+                (x[anterior] - media_x) * (y[inicio:fim] - y[anterior]) -
+                (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+            )
+            anterior = inicio + int(np.argmax(areas))
+            selecionados[i + 1] = anterior
+
+        return selecionados
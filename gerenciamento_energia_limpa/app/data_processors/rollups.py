@@ -0,0 +1,130 @@
+# Importações condicionais e tardias (carregadas no primeiro uso) para permitir execução mesmo sem todas as dependências
+from app.importacao import importar_tardio
+try:
+    np = importar_tardio('numpy')
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+NS_POR_HORA = 3600 * 10**9
+NS_POR_DIA = 24 * NS_POR_HORA
+
+class Rollups:
+    """
+    Agregações diárias e horárias pré-calculadas das séries de uma fonte
+
+    Cada tabela é um dicionário de arrays NumPy indexado por 'bucket'
+    (dias ou horas desde 1970-01-01) com energia somada, potência máxima,
+    soma e quantidade de amostras de potência (para a média), temperatura
+    máxima do inversor e o instante da última leitura do bucket.
+    """
+
+    COLUNAS = ['bucket', 'energia_kwh', 'potencia_max', 'potencia_soma',
+               'amostras', 'temperatura_max', 'ultima_leitura']
+
+    @staticmethod
+    def vazia():
+        """Retorna uma tabela de agregação sem linhas"""
+        return {
+            'bucket': np.empty(0, dtype='int64'),
+            'energia_kwh': np.empty(0, dtype='float64'),
+            'potencia_max': np.empty(0, dtype='float64'),
+            'potencia_soma': np.empty(0, dtype='float64'),
+            'amostras': np.empty(0, dtype='int64'),
+            'temperatura_max': np.empty(0, dtype='float64'),
+            'ultima_leitura': np.empty(0, dtype='int64'),
+        }
+
+    @staticmethod
+    def _maximo_por_grupo(indices, valores, n):
+        """Máximo por grupo ignorando NaN (NaN se o grupo não tiver valores)"""
+        resultado = np.full(n, -np.inf)
+        validos = ~np.isnan(valores)
+        np.maximum.at(resultado, indices[validos], valores[validos])
+        resultado[np.isneginf(resultado)] = np.nan
+        return resultado
+
+    @classmethod
+    def agregar(cls, colunas, ns_por_bucket):
+        """
+        Agrega as colunas de uma partição em buckets de tamanho fixo
+
+        Args:
+            colunas (dict): Arrays da partição (data_hora em ns, ordenado)
+            ns_por_bucket (int): NS_POR_DIA ou NS_POR_HORA
+
+        Returns:
+            dict: Tabela de agregação
+        """
+        data_hora = colunas['data_hora']
+        if len(data_hora) == 0:
+            return cls.vazia()
+
+        # Remover duplicações por data_hora mantendo a última gravação
+        ultimo = np.append(data_hora[1:] != data_hora[:-1], True)
+        data_hora = data_hora[ultimo]
+        potencia = colunas['potencia_kw'][ultimo]
+        energia = colunas['energia_kwh'][ultimo]
+        temperatura = colunas['temperatura_inversor'][ultimo]
+
+        buckets, indices = np.unique(data_hora // ns_por_bucket, return_inverse=True)
+        n = len(buckets)
+        potencia_valida = ~np.isnan(potencia)
+
+        ultima_leitura = np.zeros(n, dtype='int64')
+        np.maximum.at(ultima_leitura, indices, data_hora)
+
+        return {
+            'bucket': buckets.astype('int64'),
+            'energia_kwh': np.bincount(indices, weights=np.nan_to_num(energia), minlength=n),
+            'potencia_max': cls._maximo_por_grupo(indices, potencia, n),
+            'potencia_soma': np.bincount(indices, weights=np.where(potencia_valida, potencia, 0.0), minlength=n),
+            'amostras': np.bincount(indices, weights=potencia_valida, minlength=n).astype('int64'),
+            'temperatura_max': cls._maximo_por_grupo(indices, temperatura, n),
+            'ultima_leitura': ultima_leitura,
+        }
+
+    @classmethod
+    def substituir_intervalo(cls, tabela, nova, bucket_inicio, bucket_fim):
+        """
+        Substitui as linhas de [bucket_inicio, bucket_fim) de uma tabela pelas de outra
+
+        Returns:
+            dict: Tabela resultante ordenada por bucket
+        """
+        manter = (tabela['bucket'] < bucket_inicio) | (tabela['bucket'] >= bucket_fim)
+        resultado = {nome: np.concatenate([tabela[nome][manter], nova[nome]]) for nome in cls.COLUNAS}
+        ordem = np.argsort(resultado['bucket'], kind='stable')
+        return {nome: valores[ordem] for nome, valores in resultado.items()}
+
+    @staticmethod
+    def matriz_dia_hora(buckets, valores):
+        """
+        Distribui valores horários em uma matriz dias x 24 horas
+
+        Args:
+            buckets (ndarray): Horas desde 1970-01-01 (únicas e em ordem crescente)
+            valores (ndarray): Valor de cada hora (NaN = sem leitura)
+
+        Returns:
+            tuple: (dias desde 1970-01-01, matriz de valores, matriz booleana
+            das células com leitura); os dias cobrem todo o intervalo, inclusive
+            dias sem leituras
+        """
+        buckets = np.asarray(buckets, dtype='int64')
+        valores = np.asarray(valores, dtype='float64')
+        if len(buckets) == 0:
+            return np.empty(0, dtype='int64'), np.empty((0, 24)), np.empty((0, 24), dtype=bool)
+
+        dias = buckets // 24
+        primeiro = int(dias[0])
+        quantidade = int(dias[-1]) - primeiro + 1
+
+        # Posição de cada hora na matriz achatada (dia x 24 + hora)
+        posicoes = (dias - primeiro) * 24 + buckets % 24
+        validos = ~np.isnan(valores)
+        matriz = np.bincount(posicoes, weights=np.where(validos, valores, 0.0), minlength=quantidade * 24)
+        presentes = np.bincount(posicoes, weights=validos, minlength=quantidade * 24) > 0
+
+        return (np.arange(primeiro, primeiro + quantidade, dtype='int64'),
+                matriz.reshape(quantidade, 24), presentes.reshape(quantidade, 24))
@@ -0,0 +1,48 @@
+import sys
+import threading
+import importlib
+import importlib.util
+import types
+
+class ModuloTardio(types.ModuleType):
+    """
+    Módulo importado apenas no primeiro acesso a um de seus atributos
+
+    Usado para dependências pesadas (pandas, numpy) que não são necessárias
+    para iniciar a aplicação. Após a importação os atributos do módulo são
+    copiados para o objeto, de modo que os acessos seguintes não passam
+    mais por __getattr__.
+    """
+
+    def __init__(self, nome):
+        super().__init__(nome)
+        self._lock_importacao = threading.Lock()
+
+    def __getattr__(self, atributo):
+        if atributo.startswith('__'):
+            # Atributos especiais consultados por inspect/copy/pickle não disparam a importação
+            raise AttributeError(atributo)
+
+        with self._lock_importacao:
+            modulo = importlib.import_module(self.__name__)
+            self.__dict__.update(vars(modulo))
+        return getattr(modulo, atributo)
+
+def importar_tardio(nome):
+    """
+    Retorna um módulo que só será importado no primeiro uso
+
+    Args:
+        nome (str): Nome do módulo (ex.: 'pandas')
+
+    Returns:
+        module: O próprio módulo se já estiver importado, senão um ModuloTardio
+
+    Raises:
+        ImportError: Se o módulo não estiver instalado
+    """
+    if nome in sys.modules:
+        return sys.modules[nome]
+    if importlib.util.find_spec(nome) is None:
+        raise ImportError(f"No module named '{nome}'")
+    return ModuloTardio(nome)
@@ -1,10 +1,14 @@
 import os
 import json
+import sqlite3
+import threading
+from contextlib import closing
 
 class FonteEnergia:
     """Modelo para representar uma fonte de energia solar"""
     
-    def __init__(self, nome, localizacao, capacidade, marca, modelo, data_instalacao, id=None):
+    def __init__(self, nome, localizacao, capacidade, marca, modelo, data_instalacao, id=None,
+                 latitude=None, longitude=None):
         self.id = id
         self.nome = nome
         self.localizacao = localizacao
@@ -12,6 +16,16 @@ class FonteEnergia:
         self.marca = marca
         self.modelo = modelo
         self.data_instalacao = data_instalacao
+        # Coordenadas da localização (resolvidas uma vez, ao salvar a fonte)
+        self.latitude = float(latitude) if latitude is not None else None
+        self.longitude = float(longitude) if longitude is not None else None
+    
+    @property
+    def coordenadas(self):
+        """Tupla (latitude, longitude) ou None se ainda não resolvidas"""
+        if self.latitude is None or self.longitude is None:
+            return None
+        return (self.latitude, self.longitude)
         
     def to_dict(self):
         """Converte o objeto para dicionário"""
@@ -22,7 +36,9 @@ class FonteEnergia:
             'capacidade': self.capacidade,
             'marca': self.marca,
             'modelo': self.modelo,
-            'data_instalacao': self.data_instalacao
+            'data_instalacao': self.data_instalacao,
+            'latitude': self.latitude,
+            'longitude': self.longitude
         }
     
     @classmethod
@@ -35,42 +51,94 @@ class FonteEnergia:
             capacidade=data.get('capacidade'),
             marca=data.get('marca'),
             modelo=data.get('modelo'),
-            data_instalacao=data.get('data_instalacao')
+            data_instalacao=data.get('data_instalacao'),
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude')
         )
         
 class FonteEnergiaRepository:
-    """Repositório para persistência de fontes de energia"""
+    """
+    Repositório para persistência de fontes de energia
+    
+    Os dados ficam em um banco SQLite (data/fontes_energia.db) indexado pelo
+    ID, com cada escrita em uma transação. Na primeira utilização, as fontes
+    do arquivo JSON antigo (data/fontes_energia.json) são migradas.
+    """
+    
+    DB_FILE = os.path.join('data', 'fontes_energia.db')
     
+    # Arquivo JSON do formato antigo (origem da migração)
     FONTES_FILE = os.path.join('data', 'fontes_energia.json')
     
+    # Colunas persistidas, na ordem de FonteEnergia.to_dict
+    COLUNAS = ['id', 'nome', 'localizacao', 'capacidade', 'marca', 'modelo', 'data_instalacao',
+               'latitude', 'longitude']
+    
+    # Versão do esquema (PRAGMA user_version); 0 indica banco ainda não inicializado
+    # 1: tabela de fontes; 2: colunas de coordenadas
+    VERSAO_ESQUEMA = 2
+    
+    _lock_inicializacao = threading.Lock()
+    
+    # Catálogo em memória das fontes, invalidado por escritas ou pela mudança do arquivo
+    _catalogo = None          # lista de dicionários, ordenada por ID
+    _catalogo_por_id = {}     # id -> dicionário
+    _catalogo_objetos = []    # objetos FonteEnergia (navbar)
+    _catalogo_versao = None
+    _lock_catalogo = threading.Lock()
+    
     @classmethod
-    def salvar(cls, fonte):
-        """Salva uma fonte no repositório"""
-        fontes = cls.listar_todas()
+    def _conectar(cls):
+        """Abre uma conexão com o banco, criando o esquema e migrando o JSON se necessário"""
+        os.makedirs(os.path.dirname(cls.DB_FILE), exist_ok=True)
+        conexao = sqlite3.connect(cls.DB_FILE, timeout=10)
+        conexao.row_factory = sqlite3.Row
         
-        # Gera um novo ID se não existir
-        if fonte.id is None:
-            ids = [f['id'] for f in fontes if f['id'] is not None]
-            fonte.id = 1 if not ids else max(ids) + 1
-            
-        # Atualiza ou adiciona a fonte
-        for i, f in enumerate(fontes):
-            if f['id'] == fonte.id:
-                fontes[i] = fonte.to_dict()
-                break
-        else:
-            fontes.append(fonte.to_dict())
-            
-        # Salva no arquivo
-        os.makedirs(os.path.dirname(cls.FONTES_FILE), exist_ok=True)
-        with open(cls.FONTES_FILE, 'w') as f:
-            json.dump(fontes, f, indent=4)
+        if conexao.execute('PRAGMA user_version').fetchone()[0] < cls.VERSAO_ESQUEMA:
+            with cls._lock_inicializacao:
+                cls._inicializar(conexao)
+                
+        return conexao
+    
+    @classmethod
+    def _inicializar(cls, conexao):
+        """Cria/atualiza a tabela de fontes e importa as fontes do JSON antigo (uma única vez)"""
+        with conexao:
+            conexao.execute('BEGIN IMMEDIATE')
+            # Outro processo pode ter inicializado enquanto aguardávamos o lock
+            versao = conexao.execute('PRAGMA user_version').fetchone()[0]
+            if versao >= cls.VERSAO_ESQUEMA:
+                return
             
-        return fonte
+            if versao < 1:
+                conexao.execute("""
+                    CREATE TABLE IF NOT EXISTS fontes (
+                        id INTEGER PRIMARY KEY,
+                        nome TEXT,
+                        localizacao TEXT,
+                        capacidade REAL,
+                        marca TEXT,
+                        modelo TEXT,
+                        data_instalacao TEXT,
+                        latitude REAL,
+                        longitude REAL
+                    )
+                """)
+                
+                for fonte in cls._ler_json_antigo():
+                    cls._gravar(conexao, FonteEnergia.from_dict(fonte))
+            elif versao < 2:
+                conexao.execute('ALTER TABLE fontes ADD COLUMN latitude REAL')
+                conexao.execute('ALTER TABLE fontes ADD COLUMN longitude REAL')
+                
+            conexao.execute(f'PRAGMA user_version = {cls.VERSAO_ESQUEMA}')
+        
+        # Leitores não bloqueiam escritores (e vice-versa)
+        conexao.execute('PRAGMA journal_mode=WAL')
     
     @classmethod
-    def listar_todas(cls):
-        """Lista todas as fontes cadastradas"""
+    def _ler_json_antigo(cls):
+        """Lê as fontes do arquivo JSON antigo, se existir"""
         if not os.path.exists(cls.FONTES_FILE):
             return []
             
@@ -80,20 +148,96 @@ class FonteEnergiaRepository:
             except json.JSONDecodeError:
                 return []
     
+    @classmethod
+    def _gravar(cls, conexao, fonte):
+        """Insere ou atualiza uma fonte (dentro da transação da conexão)"""
+        dados = fonte.to_dict()
+        colunas = ', '.join(cls.COLUNAS)
+        parametros = ', '.join(f':{coluna}' for coluna in cls.COLUNAS)
+        cursor = conexao.execute(
+            f'INSERT OR REPLACE INTO fontes ({colunas}) VALUES ({parametros})',
+            {coluna: dados.get(coluna) for coluna in cls.COLUNAS}
+        )
+        if fonte.id is None:
+            fonte.id = cursor.lastrowid
+    
+    @classmethod
+    def _versao_arquivo(cls):
+        """Versão do banco em disco (mtime e tamanho do banco e do WAL)"""
+        versao = []
+        for caminho in (cls.DB_FILE, f'{cls.DB_FILE}-wal'):
+            try:
+                info = os.stat(caminho)
+                versao.append((info.st_mtime_ns, info.st_size))
+            except FileNotFoundError:
+                versao.append(None)
+        return tuple(versao)
+    
+    @classmethod
+    def _obter_catalogo(cls):
+        """Retorna o catálogo em memória, recarregando-o se o banco mudou"""
+        versao = cls._versao_arquivo()
+        with cls._lock_catalogo:
+            if cls._catalogo is not None and cls._catalogo_versao == versao:
+                return cls._catalogo
+                
+            with closing(cls._conectar()) as conexao:
+                linhas = conexao.execute('SELECT * FROM fontes ORDER BY id').fetchall()
+            
+            catalogo = [dict(linha) for linha in linhas]
+            cls._catalogo_por_id = {fonte['id']: fonte for fonte in catalogo}
+            cls._catalogo_objetos = [FonteEnergia.from_dict(fonte) for fonte in catalogo]
+            # A versão é lida após a conexão (que pode ter criado o banco)
+            cls._catalogo_versao = cls._versao_arquivo() if versao[0] is None else versao
+            cls._catalogo = catalogo
+            return catalogo
+    
+    @classmethod
+    def invalidar_catalogo(cls):
+        """Descarta o catálogo em memória (recarregado no próximo acesso)"""
+        with cls._lock_catalogo:
+            cls._catalogo = None
+    
+    @classmethod
+    def salvar(cls, fonte):
+        """Salva uma fonte no repositório"""
+        try:
+            with closing(cls._conectar()) as conexao:
+                with conexao:
+                    # Gera um novo ID (maior ID + 1) se não existir
+                    cls._gravar(conexao, fonte)
+        finally:
+            cls.invalidar_catalogo()
+            
+        return fonte
+    
+    @classmethod
+    def listar_todas(cls):
+        """Lista todas as fontes cadastradas (dicionários somente para leitura)"""
+        return list(cls._obter_catalogo())
+    
+    @classmethod
+    def listar_objetos(cls):
+        """Lista todas as fontes como objetos FonteEnergia (somente para leitura)"""
+        cls._obter_catalogo()
+        return list(cls._catalogo_objetos)
+    
     @classmethod
     def buscar_por_id(cls, id):
         """Busca uma fonte pelo ID"""
-        fontes = cls.listar_todas()
-        for fonte in fontes:
-            if fonte['id'] == id:
-                return FonteEnergia.from_dict(fonte)
-        return None
+        cls._obter_catalogo()
+        fonte = cls._catalogo_por_id.get(id)
+        if fonte is None:
+            return None
+        # Novo objeto a cada chamada: as views alteram o objeto antes de salvar
+        return FonteEnergia.from_dict(fonte)
         
     @classmethod
     def excluir(cls, id):
         """Exclui uma fonte pelo ID"""
-        fontes = cls.listar_todas()
-        fontes = [f for f in fontes if f['id'] != id]
-        
-        with open(cls.FONTES_FILE, 'w') as f:
-            json.dump(fontes, f, indent=4)
\ No newline at end of file
+        try:
+            with closing(cls._conectar()) as conexao:
+                with conexao:
+                    conexao.execute('DELETE FROM fontes WHERE id = ?', (id,))
+        finally:
+            cls.invalidar_catalogo()
@@ -1,22 +1,124 @@
 import os
-import requests
+import re
+import time
+import threading
+import unicodedata
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import json
-from dotenv import load_dotenv
 
-# Carregar variáveis de ambiente
-load_dotenv()
+class WeatherServiceUnavailable(Exception):
+    """Requisição não realizada: circuito aberto ou prazo da requisição esgotado"""
 
-# Verificar se a chave está sendo carregada
-api_key = os.environ.get("WEATHER_API_KEY", "")
-print(f"Chave de API carregada: {api_key[:5]}{'*' * 10} (primeiros 5 caracteres)")
+def _criar_deadline_retry():
+    """
+    Cria a classe Retry que não inicia uma nova tentativa se a espera ultrapassar o prazo da requisição
+    
+    requests/urllib3 só são importados ao criar a sessão HTTP (não na inicialização da aplicação).
+    """
+    from urllib3.exceptions import MaxRetryError
+    from urllib3.util.retry import Retry
+    
+    class _DeadlineRetry(Retry):
+        def sleep(self, response=None):
+            restante = WeatherService.get_remaining_budget()
+            if restante is not None:
+                espera = None
+                if response is not None and self.respect_retry_after_header:
+                    espera = self.get_retry_after(response)
+                if espera is None:
+                    espera = self.get_backoff_time()
+                if espera >= restante:
+                    raise MaxRetryError(None, None, WeatherServiceUnavailable("Prazo da requisição esgotado"))
+            super().sleep(response)
+    
+    return _DeadlineRetry
+
+def _criar_deadline_timeout():
+    """
+    Cria a classe Timeout cujos limites são recalculados a cada tentativa com o tempo restante do prazo
+    
+    O urllib3 reutiliza (clona) o mesmo Timeout em todas as novas tentativas; sem isso,
+    o limite calculado antes da primeira tentativa permitiria ultrapassar o prazo.
+    """
+    from urllib3.util.timeout import Timeout
+    
+    def limitar(valor):
+        restante = WeatherService.get_remaining_budget()
+        if restante is None or not isinstance(valor, (int, float)):
+            return valor
+        # Prazo esgotado: a tentativa falha imediatamente e _DeadlineRetry não faz outra
+        return max(min(valor, restante), 0.001)
+    
+    class _DeadlineTimeout(Timeout):
+        def clone(self):
+            return type(self)(connect=self._connect, read=self._read, total=self.total)
+        
+        @property
+        def connect_timeout(self):
+            return limitar(super().connect_timeout)
+        
+        @property
+        def read_timeout(self):
+            return limitar(super().read_timeout)
+    
+    return _DeadlineTimeout
 
 class WeatherService:
     """Serviço para obtenção de dados meteorológicos usando a API OpenWeather"""
     
-    BASE_URL = "https://api.openweathermap.org/data/2.5"
+    # Raiz da API (pode apontar para o servidor local openweather_stub.py)
+    API_ROOT = os.environ.get("WEATHER_API_ROOT", "https://api.openweathermap.org").rstrip("/")
+    BASE_URL = os.environ.get("WEATHER_BASE_URL", f"{API_ROOT}/data/2.5")
+    GEO_URL = os.environ.get("WEATHER_GEO_URL", f"{API_ROOT}/geo/1.0")
     API_KEY = os.environ.get("WEATHER_API_KEY", "")  # Obter chave da API das variáveis de ambiente
     
+    # Timeouts (segundos) de conexão e de leitura das requisições
+    CONNECT_TIMEOUT = float(os.environ.get("WEATHER_CONNECT_TIMEOUT", "3.05"))
+    READ_TIMEOUT = float(os.environ.get("WEATHER_READ_TIMEOUT", "10"))
+    
+    # Novas tentativas com backoff exponencial limitado para 429 e erros 5xx
+    MAX_RETRIES = int(os.environ.get("WEATHER_MAX_RETRIES", "3"))
+    BACKOFF_FACTOR = float(os.environ.get("WEATHER_BACKOFF_FACTOR", "0.5"))
+    BACKOFF_MAX = float(os.environ.get("WEATHER_BACKOFF_MAX", "8"))
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    
+    # Conexões mantidas abertas (keep-alive) por host
+    POOL_MAXSIZE = int(os.environ.get("WEATHER_POOL_MAXSIZE", "10"))
+    
+    # Cache de previsões por célula da grade (memória + disco)
+    FORECAST_CACHE_DIR = os.path.join("data", "weather_cache")
+    FORECAST_CACHE_TTL = int(os.environ.get("WEATHER_CACHE_TTL", str(3 * 3600)))
+    GRID_DECIMALS = int(os.environ.get("WEATHER_GRID_DECIMALS", "1"))  # 0.1° ≈ 11 km
+    
+    _forecast_cache = {}  # célula -> (obtido_em, resposta da API)
+    _forecast_cache_lock = threading.Lock()
+    _cell_locks = {}
+    
+    # Cache persistente de geocoding (endereço normalizado -> coordenadas)
+    GEOCODING_CACHE_FILE = os.path.join("data", "weather_cache", "geocoding.json")
+    _geocoding_cache = None
+    _geocoding_cache_lock = threading.Lock()
+    
+    # Circuit breaker: abre após falhas consecutivas e libera uma requisição de teste após o intervalo
+    CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("WEATHER_CIRCUIT_FAILURES", "5"))
+    CIRCUIT_RESET_TIMEOUT = float(os.environ.get("WEATHER_CIRCUIT_RESET", "30"))
+    
+    _circuit = {"state": "closed", "failures": 0, "opened_at": None, "trips": 0,
+                "rejected": 0, "probe_in_flight": False}
+    _circuit_lock = threading.Lock()
+    
+    # Prazo total (segundos) de uma previsão de geração: geocoding + previsão do tempo
+    REQUEST_BUDGET = float(os.environ.get("WEATHER_REQUEST_BUDGET", "8"))
+    _deadline = threading.local()
+    
+    _session = None
+    _session_lock = threading.Lock()
+    _timeout_class = None
+    _http_stats = {"requests": 0, "retries": 0, "errors": 0, "cache_hits": 0, "cache_misses": 0,
+                   "deadline_exceeded": 0}
+    _http_stats_lock = threading.Lock()
+    
     # Coordenadas padrão para cidades conhecidas no sistema
     DEFAULT_COORDINATES = {
         "São Paulo": (-23.5505, -46.6333),
@@ -25,18 +127,276 @@ class WeatherService:
         "Aeroporto, Cachoeiro de Itapemirim - ES": (-20.8477, -41.1150)
     }
     
+    @classmethod
+    def _get_session(cls):
+        """Retorna a sessão HTTP compartilhada (pool de conexões com novas tentativas)"""
+        if cls._session is None:
+            with cls._session_lock:
+                if cls._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    _DeadlineRetry = _criar_deadline_retry()
+                    
+                    retry_kwargs = dict(
+                        total=cls.MAX_RETRIES,
+                        backoff_factor=cls.BACKOFF_FACTOR,
+                        status_forcelist=cls.RETRY_STATUS,
+                        allowed_methods=frozenset(["GET"]),
+                        respect_retry_after_header=True,
+                        raise_on_status=False  # Retorna a última resposta após esgotar as tentativas
+                    )
+                    try:
+                        retry = _DeadlineRetry(backoff_max=cls.BACKOFF_MAX, **retry_kwargs)
+                    except TypeError:
+                        # urllib3 < 2.0: limite do backoff é atributo da classe
+                        retry = _DeadlineRetry(**retry_kwargs)
+                        retry.BACKOFF_MAX = cls.BACKOFF_MAX
+                    
+                    adapter = HTTPAdapter(
+                        pool_connections=4,
+                        pool_maxsize=cls.POOL_MAXSIZE,
+                        max_retries=retry
+                    )
+                    session = requests.Session()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    cls._timeout_class = _criar_deadline_timeout()
+                    cls._session = session
+        return cls._session
+    
+    @classmethod
+    @contextmanager
+    def deadline(cls, segundos=None):
+        """
+        Limita o tempo total das requisições feitas pela thread dentro do bloco
+        
+        Timeouts são reduzidos ao tempo restante, novas tentativas que não
+        caberiam no prazo não são feitas e, esgotado o prazo, as requisições
+        falham imediatamente (os chamadores usam o fallback).
+        
+        Args:
+            segundos (float): Prazo total (padrão: REQUEST_BUDGET)
+        """
+        anterior = getattr(cls._deadline, "fim", None)
+        fim = time.monotonic() + (cls.REQUEST_BUDGET if segundos is None else segundos)
+        # Um prazo interno nunca estende o prazo externo
+        cls._deadline.fim = fim if anterior is None else min(fim, anterior)
+        try:
+            yield
+        finally:
+            cls._deadline.fim = anterior
+    
+    @classmethod
+    def get_remaining_budget(cls):
+        """Segundos restantes do prazo da thread atual ou None se não houver prazo"""
+        fim = getattr(cls._deadline, "fim", None)
+        if fim is None:
+            return None
+        return fim - time.monotonic()
+    
+    @classmethod
+    def _circuit_allow(cls):
+        """Indica se uma requisição pode ser feita de acordo com o estado do circuito"""
+        with cls._circuit_lock:
+            circuit = cls._circuit
+            if circuit["state"] == "open" and time.monotonic() - circuit["opened_at"] >= cls.CIRCUIT_RESET_TIMEOUT:
+                circuit["state"] = "half_open"
+                
+            if circuit["state"] == "closed":
+                return True
+            if circuit["state"] == "half_open" and not circuit["probe_in_flight"]:
+                # Apenas uma requisição de teste por vez
+                circuit["probe_in_flight"] = True
+                return True
+                
+            circuit["rejected"] += 1
+            return False
+    
+    @classmethod
+    def _circuit_record(cls, sucesso):
+        """Registra o resultado de uma requisição no circuito"""
+        with cls._circuit_lock:
+            circuit = cls._circuit
+            circuit["probe_in_flight"] = False
+            if sucesso:
+                circuit["state"] = "closed"
+                circuit["failures"] = 0
+                return
+                
+            circuit["failures"] += 1
+            if circuit["state"] == "half_open" or (
+                    circuit["state"] == "closed" and circuit["failures"] >= cls.CIRCUIT_FAILURE_THRESHOLD):
+                circuit["state"] = "open"
+                circuit["opened_at"] = time.monotonic()
+                circuit["trips"] += 1
+                print(f"API de clima indisponível: circuito aberto por {cls.CIRCUIT_RESET_TIMEOUT:.0f}s")
+    
+    @classmethod
+    def _http_get(cls, url, params):
+        """
+        Faz uma requisição GET pela sessão compartilhada
+        
+        Raises:
+            WeatherServiceUnavailable: Circuito aberto ou prazo esgotado (sem requisição)
+        """
+        restante = cls.get_remaining_budget()
+        if restante is not None and restante <= 0:
+            cls._contar("deadline_exceeded")
+            raise WeatherServiceUnavailable("Prazo da requisição esgotado")
+        
+        if not cls._circuit_allow():
+            raise WeatherServiceUnavailable("Circuito aberto: API de clima indisponível")
+        
+        cls._contar("requests")
+        try:
+            session = cls._get_session()
+            if restante is None:
+                timeout = (cls.CONNECT_TIMEOUT, cls.READ_TIMEOUT)
+            else:
+                # Limites reduzidos ao tempo restante do prazo no início de cada tentativa
+                timeout = cls._timeout_class(connect=cls.CONNECT_TIMEOUT, read=cls.READ_TIMEOUT)
+            response = session.get(url, params=params, timeout=timeout)
+        except Exception:
+            cls._contar("errors")
+            cls._circuit_record(False)
+            raise
+        
+        # Erros 5xx/429 após as novas tentativas contam como falha da API; 4xx não
+        cls._circuit_record(response.status_code not in cls.RETRY_STATUS)
+        
+        # Quantidade de novas tentativas feitas pelo urllib3 nesta requisição
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        if retries is not None and getattr(retries, "history", None):
+            cls._contar("retries", len(retries.history))
+        return response
+    
+    @classmethod
+    def _contar(cls, metrica, quantidade=1):
+        """Incrementa um contador das métricas HTTP"""
+        with cls._http_stats_lock:
+            cls._http_stats[metrica] += quantidade
+    
+    @classmethod
+    def get_http_metrics(cls):
+        """
+        Métricas de uso do pool de conexões HTTP
+        
+        Returns:
+            dict: Requisições, novas tentativas e erros, além das conexões
+            abertas e requisições por host (conexões reutilizadas = requisições - conexões)
+            e o estado do circuit breaker
+        """
+        hosts = {}
+        session = cls._session
+        if session is not None:
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    host = f"{pool.scheme}://{pool.host}:{pool.port}"
+                    conexoes = getattr(pool, "num_connections", 0)
+                    requisicoes = getattr(pool, "num_requests", 0)
+                    hosts[host] = {
+                        "connections_created": conexoes,
+                        "requests": requisicoes,
+                        "connections_reused": max(0, requisicoes - conexoes),
+                        "idle_connections": sum(1 for c in list(pool.pool.queue) if c is not None) if pool.pool is not None else 0,
+                        "pool_maxsize": cls.POOL_MAXSIZE
+                    }
+        
+        with cls._circuit_lock:
+            circuit = cls._circuit
+            if circuit["state"] == "open" and time.monotonic() - circuit["opened_at"] >= cls.CIRCUIT_RESET_TIMEOUT:
+                circuit["state"] = "half_open"
+            circuit_metrics = {
+                "state": circuit["state"],
+                "consecutive_failures": circuit["failures"],
+                "trips": circuit["trips"],
+                "rejected": circuit["rejected"],
+                "open_for_s": round(time.monotonic() - circuit["opened_at"], 1) if circuit["state"] != "closed" else None
+            }
+        
+        with cls._http_stats_lock:
+            return {**cls._http_stats, "hosts": hosts, "circuit": circuit_metrics}
+    
+    @classmethod
+    def get_grid_cell(cls, lat, lon):
+        """Célula da grade (lat/lon arredondadas) usada como chave do cache de previsões"""
+        return (round(float(lat), cls.GRID_DECIMALS), round(float(lon), cls.GRID_DECIMALS))
+    
+    @classmethod
+    def _forecast_cache_path(cls, cell):
+        """Arquivo do cache em disco de uma célula da grade"""
+        return os.path.join(cls.FORECAST_CACHE_DIR, f"forecast_{cell[0]}_{cell[1]}.json")
+    
+    @classmethod
+    def _get_cached_forecast(cls, cell):
+        """Retorna (obtido_em, dados) da célula se estiver dentro do TTL, senão None"""
+        agora = time.time()
+        with cls._forecast_cache_lock:
+            cached = cls._forecast_cache.get(cell)
+        
+        if cached is None:
+            # Cache em disco (compartilhado entre processos e reinicializações)
+            caminho = cls._forecast_cache_path(cell)
+            if os.path.exists(caminho):
+                try:
+                    with open(caminho, "r") as f:
+                        conteudo = json.load(f)
+                    cached = (conteudo["fetched_at"], conteudo["data"])
+                    with cls._forecast_cache_lock:
+                        cls._forecast_cache[cell] = cached
+                except Exception as e:
+                    print(f"Erro ao ler cache de previsão: {str(e)}")
+        
+        if cached is None or agora - cached[0] > cls.FORECAST_CACHE_TTL:
+            return None
+        return cached
+    
+    @classmethod
+    def _store_cached_forecast(cls, cell, data):
+        """Armazena a resposta da API no cache em memória e em disco"""
+        cached = (time.time(), data)
+        with cls._forecast_cache_lock:
+            cls._forecast_cache[cell] = cached
+        
+        try:
+            os.makedirs(cls.FORECAST_CACHE_DIR, exist_ok=True)
+            caminho = cls._forecast_cache_path(cell)
+            temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporario, "w") as f:
+                json.dump({"fetched_at": cached[0], "data": data}, f)
+            os.replace(temporario, caminho)
+        except Exception as e:
+            print(f"Erro ao salvar cache de previsão: {str(e)}")
+        
+        return cached
+    
+    @classmethod
+    def _get_cell_lock(cls, cell):
+        """Lock por célula: apenas uma chamada à API por célula e janela de atualização"""
+        with cls._forecast_cache_lock:
+            return cls._cell_locks.setdefault(cell, threading.Lock())
+    
     @classmethod
     def get_forecast(cls, lat, lon, days=5):
         """
         Obtém previsão meteorológica para uma localização específica
         
+        As respostas da API ficam em cache por célula da grade (lat/lon
+        arredondadas) durante FORECAST_CACHE_TTL segundos, de modo que fontes
+        próximas compartilham uma única chamada por janela de atualização.
+        
         Args:
             lat (float): Latitude da localização
             lon (float): Longitude da localização
             days (int): Número de dias para previsão (máx. 7 para API gratuita)
             
         Returns:
-            dict: Dados de previsão formatados ou None em caso de erro
+            dict: Dados de previsão formatados ou None em caso de erro.
+            Cada dia inclui weather_fetched_at (momento da consulta à API)
         """
         if not cls.API_KEY:
             print("Chave de API do OpenWeather não configurada")
@@ -45,6 +405,44 @@ class WeatherService:
         # Limitar o número de dias a 7 (limitação da API gratuita)
         days = min(days, 7)
         
+        cell = cls.get_grid_cell(lat, lon)
+        cached = cls._get_cached_forecast(cell)
+        if cached is None:
+            # Aguardar a requisição em andamento para a célula no máximo até o fim do prazo
+            restante = cls.get_remaining_budget()
+            cell_lock = cls._get_cell_lock(cell)
+            if not cell_lock.acquire(timeout=max(0.0, restante) if restante is not None else -1):
+                cls._contar("deadline_exceeded")
+                print("Prazo esgotado aguardando a previsão do tempo")
+                return None
+            try:
+                # Outra requisição pode ter atualizado a célula enquanto aguardávamos
+                cached = cls._get_cached_forecast(cell)
+                if cached is None:
+                    cls._contar("cache_misses")
+                    data = cls._fetch_forecast(*cell)
+                    if data is None:
+                        return None
+                    cached = cls._store_cached_forecast(cell, data)
+                else:
+                    cls._contar("cache_hits")
+            finally:
+                cell_lock.release()
+        else:
+            cls._contar("cache_hits")
+        
+        fetched_at, data = cached
+        forecast = cls._format_forecast_data(data, days)
+        if forecast:
+            fetched_at_iso = datetime.fromtimestamp(fetched_at).isoformat()
+            for day in forecast:
+                day["weather_fetched_at"] = fetched_at_iso
+        
+        return forecast
+    
+    @classmethod
+    def _fetch_forecast(cls, lat, lon):
+        """Consulta a API de previsão e retorna a resposta bruta ou None em caso de erro"""
         try:
             # Mostrar a URL que será usada (sem a chave)
             url = f"{cls.BASE_URL}/onecall"
@@ -52,7 +450,7 @@ class WeatherService:
             print(f"Parâmetros: lat={lat}, lon={lon}, units=metric, exclui minutely,hourly,alerts,current")
             
             # Fazer a chamada à API
-            response = requests.get(
+            response = cls._http_get(
                 url,
                 params={
                     "lat": lat,
@@ -60,8 +458,7 @@ class WeatherService:
                     "exclude": "minutely,hourly,alerts,current",
                     "units": "metric",
                     "appid": cls.API_KEY
-                },
-                timeout=10
+                }
             )
             
             if response.status_code != 200:
@@ -69,11 +466,7 @@ class WeatherService:
                 print(f"URL completa (sem chave): {response.url.split('&appid=')[0]}")
                 return None
                 
-            # Extrair e formatar dados de previsão
-            data = response.json()
-            forecast = cls._format_forecast_data(data, days)
-            
-            return forecast
+            return response.json()
             
         except Exception as e:
             print(f"Erro ao acessar API de previsão do tempo: {str(e)}")
@@ -121,6 +514,49 @@ class WeatherService:
             
         return forecast
     
+    @staticmethod
+    def normalize_address(location_string):
+        """Normaliza um endereço para chave do cache (sem acentos, minúsculo, espaços únicos)"""
+        texto = unicodedata.normalize("NFKD", location_string or "")
+        texto = "".join(c for c in texto if not unicodedata.combining(c))
+        return re.sub(r"\s+", " ", texto).strip().lower()
+    
+    @classmethod
+    def _load_geocoding_cache(cls):
+        """Carrega o cache de geocoding do disco (uma vez por processo)"""
+        if cls._geocoding_cache is None:
+            cache = {}
+            if os.path.exists(cls.GEOCODING_CACHE_FILE):
+                try:
+                    with open(cls.GEOCODING_CACHE_FILE, "r") as f:
+                        cache = json.load(f)
+                except Exception as e:
+                    print(f"Erro ao ler cache de geocoding: {str(e)}")
+            cls._geocoding_cache = cache
+        return cls._geocoding_cache
+    
+    @classmethod
+    def _get_cached_coords(cls, location_string):
+        """Coordenadas de um endereço no cache de geocoding ou None"""
+        with cls._geocoding_cache_lock:
+            coords = cls._load_geocoding_cache().get(cls.normalize_address(location_string))
+        return tuple(coords) if coords else None
+    
+    @classmethod
+    def _store_cached_coords(cls, location_string, coords):
+        """Adiciona um endereço ao cache de geocoding e o persiste em disco"""
+        with cls._geocoding_cache_lock:
+            cache = cls._load_geocoding_cache()
+            cache[cls.normalize_address(location_string)] = list(coords)
+            try:
+                os.makedirs(os.path.dirname(cls.GEOCODING_CACHE_FILE), exist_ok=True)
+                temporario = f"{cls.GEOCODING_CACHE_FILE}.{os.getpid()}.tmp"
+                with open(temporario, "w") as f:
+                    json.dump(cache, f, ensure_ascii=False, indent=2)
+                os.replace(temporario, cls.GEOCODING_CACHE_FILE)
+            except Exception as e:
+                print(f"Erro ao salvar cache de geocoding: {str(e)}")
+    
     @classmethod
     def get_location_coords(cls, location_string):
         """
@@ -137,6 +573,11 @@ class WeatherService:
             if key in location_string:
                 print(f"Usando coordenadas padrão para {key}: {coords}")
                 return coords
+        
+        # Verificar o cache persistente de geocoding
+        coords = cls._get_cached_coords(location_string)
+        if coords:
+            return coords
                 
         if not cls.API_KEY:
             print("Chave de API do OpenWeather não configurada")
@@ -144,14 +585,13 @@ class WeatherService:
             
         try:
             # Fazer a chamada à API de geocoding
-            response = requests.get(
-                "http://api.openweathermap.org/geo/1.0/direct",
+            response = cls._http_get(
+                f"{cls.GEO_URL}/direct",
                 params={
                     "q": location_string,
                     "limit": 1,
                     "appid": cls.API_KEY
-                },
-                timeout=10
+                }
             )
             
             if response.status_code != 200:
@@ -175,7 +615,9 @@ class WeatherService:
                 return None
                 
             location = data[0]
-            return (location["lat"], location["lon"])
+            coords = (location["lat"], location["lon"])
+            cls._store_cached_coords(location_string, coords)
+            return coords
             
         except Exception as e:
             print(f"Erro ao realizar geocoding: {str(e)}")
@@ -197,14 +639,13 @@ class WeatherService:
             
         try:
             # Testar com coordenadas conhecidas (São Paulo, Brasil)
-            response = requests.get(
+            response = cls._http_get(
                 f"{cls.BASE_URL}/weather",
                 params={
                     "lat": -23.5505,
                     "lon": -46.6333,
                     "appid": cls.API_KEY
-                },
-                timeout=10
+                }
             )
             
             if response.status_code == 200:
@@ -1,25 +1,125 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, g
+import gzip
+import zlib
+import hashlib
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, g
 from app.models.fonte_energia import FonteEnergia, FonteEnergiaRepository
 from app.data_processors.data_importer import GrowattDataImporter
+from app.data_processors.columnar_store import ColumnarStore
+from app.data_processors.dataframe_cache import DataFrameCache
 from app.controllers.dashboard_controller import DashboardController
-from app.controllers.performance_monitor import PerformanceMonitor
+try:
+    from app.controllers.performance_monitor import PerformanceMonitor
+    PERFORMANCE_MONITOR_AVAILABLE = True
+except ImportError:
+    # Monitoramento de performance é opcional; sem ele as rotas de alertas ficam indisponíveis
+    PERFORMANCE_MONITOR_AVAILABLE = False
 from app.controllers.generation_forecaster import GenerationForecaster
-import os
-from werkzeug.utils import secure_filename
-from datetime import datetime
+from app.services.weather_service import WeatherService
+from datetime import datetime, timedelta
 
 main = Blueprint('main', __name__)
 
+def _etag_dados(versao):
+    """ETag de uma resposta: versão dos dados da fonte + rota e parâmetros da requisição"""
+    return hashlib.sha1(repr((versao, request.full_path)).encode('utf-8')).hexdigest()
+
+def resposta_condicional(fonte_id, gerar):
+    """
+    Responde a um GET de dados da fonte com suporte a ETag/If-None-Match
+    
+    O ETag deriva da versão dos dados (ColumnarStore.versao), obtida apenas
+    com os metadados dos arquivos: se o cliente já tem a versão atual, a
+    resposta é 304 sem carregar nenhum dado.
+    
+    Args:
+        fonte_id (int): ID da fonte de energia
+        gerar (callable): Função que produz os dados da resposta
+        
+    Returns:
+        Response: 304 ou JSON com ETag e Last-Modified
+    """
+    versao = ColumnarStore.versao(fonte_id)
+    if versao:
+        etag = _etag_dados(versao)
+        if request.if_none_match.contains_weak(etag):
+            resposta = Response(status=304)
+            resposta.set_etag(etag)
+            return resposta
+    
+    resposta = jsonify(gerar())
+    
+    # Só identificar a resposta se os dados não mudaram durante a geração
+    # (ex.: dados simulados gerados para uma fonte sem dados)
+    if versao and ColumnarStore.versao(fonte_id) == versao:
+        resposta.set_etag(etag)
+        resposta.last_modified = datetime.fromtimestamp(max(mtime for _, mtime, _ in versao) / 1e9)
+        resposta.cache_control.no_cache = True  # Revalidar a cada uso
+    return resposta
+
+# Respostas JSON menores que isso não são comprimidas (o cabeçalho gzip não compensaria)
+TAMANHO_MINIMO_COMPRESSAO = 1024
+
+@main.after_request
+def comprimir_resposta(resposta):
+    """Comprime as respostas JSON com gzip ou deflate quando o cliente aceita"""
+    codificacoes = request.accept_encodings
+    if (resposta.status_code != 200 or resposta.direct_passthrough
+            or resposta.mimetype != 'application/json'
+            or 'Content-Encoding' in resposta.headers):
+        return resposta
+    
+    resposta.vary.add('Accept-Encoding')
+    if codificacoes['gzip']:
+        codificacao = 'gzip'
+    elif codificacoes['deflate']:
+        codificacao = 'deflate'
+    else:
+        return resposta
+    
+    dados = resposta.get_data()
+    if len(dados) < TAMANHO_MINIMO_COMPRESSAO:
+        return resposta
+    
+    resposta.set_data(gzip.compress(dados, compresslevel=6) if codificacao == 'gzip' else zlib.compress(dados, 6))
+    resposta.headers['Content-Encoding'] = codificacao
+    
+    # A representação comprimida não é idêntica byte a byte: ETag passa a ser fraco
+    etag, fraco = resposta.get_etag()
+    if etag and not fraco:
+        resposta.set_etag(etag, weak=True)
+    return resposta
+
+def ler_data_parametro(nome, fim=False):
+    """
+    Lê um parâmetro de data (AAAA-MM-DD ou AAAA-MM-DDTHH:MM) da query string
+    
+    Args:
+        nome (str): Nome do parâmetro
+        fim (bool): Data sem horário indica o dia inteiro (até 23:59:59.999999)
+        
+    Returns:
+        datetime: Data lida ou None se ausente
+        
+    Raises:
+        ValueError: Formato inválido ou data com fuso horário (os dados são
+            armazenados em horário local, sem fuso)
+    """
+    valor = request.args.get(nome)
+    if not valor:
+        return None
+    data = datetime.fromisoformat(valor)
+    if data.tzinfo is not None:
+        raise ValueError(f"Data com fuso horário não suportada: {valor}")
+    if fim and len(valor) == 10:
+        data += timedelta(days=1) - timedelta(microseconds=1)
+    return data
+
 @main.before_request
 def obter_fontes():
     """Obtém todas as fontes para uso em todas as páginas (navbar)"""
-    if request.endpoint and request.endpoint.startswith('main.'):
-        fontes = FonteEnergiaRepository.listar_todas()
-        fontes_objetos = []
-        for fonte_dict in fontes:
-            fonte = FonteEnergia.from_dict(fonte_dict)
-            fontes_objetos.append(fonte)
-        request.fontes = fontes_objetos
+    # As APIs JSON não renderizam a navbar
+    if request.endpoint and request.endpoint.startswith('main.') and not request.endpoint.startswith('main.api_'):
+        request.fontes = FonteEnergiaRepository.listar_objetos()
 
 @main.route('/')
 def index():
@@ -41,6 +141,10 @@ def nova_fonte():
                 data_instalacao=request.form['data_instalacao']
             )
             
+            # Resolver as coordenadas uma única vez, no cadastro, dentro do prazo
+            # por requisição (se não der tempo, são resolvidas na primeira previsão)
+            with WeatherService.deadline():
+                GenerationForecaster.resolver_coordenadas(fonte, salvar=False)
             FonteEnergiaRepository.salvar(fonte)
             flash('Fonte de energia cadastrada com sucesso!', 'success')
             
@@ -76,7 +180,14 @@ def editar_fonte(fonte_id):
     if request.method == 'POST':
         try:
             fonte.nome = request.form['nome']
-            fonte.localizacao = request.form['localizacao']
+            
+            # Resolver novamente as coordenadas apenas se o endereço mudou
+            if request.form['localizacao'] != fonte.localizacao or fonte.coordenadas is None:
+                fonte.localizacao = request.form['localizacao']
+                fonte.latitude = fonte.longitude = None
+                with WeatherService.deadline():
+                    GenerationForecaster.resolver_coordenadas(fonte, salvar=False)
+            
             fonte.capacidade = request.form['capacidade']
             fonte.marca = request.form['marca']
             fonte.modelo = request.form['modelo']
@@ -102,20 +213,19 @@ def importar_dados(fonte_id):
         if 'arquivo_csv' in request.files:
             arquivo = request.files['arquivo_csv']
             if arquivo.filename:
-                # Salvar arquivo temporariamente
-                filename = secure_filename(arquivo.filename)
-                filepath = os.path.join('data', 'temp', filename)
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                arquivo.save(filepath)
-                
-                # Importar dados
-                resultado = GrowattDataImporter.importar_csv(filepath, fonte_id)
-                
-                # Remover arquivo temporário
-                os.unlink(filepath)
+                # Importar dados lendo diretamente do stream do upload
+                # (sem arquivo temporário: uploads simultâneos não se sobrescrevem)
+                resultado = GrowattDataImporter.importar_csv(
+                    arquivo.stream, fonte_id, tamanho_bloco=GrowattDataImporter.TAMANHO_BLOCO_PADRAO
+                )
                 
                 if resultado['sucesso']:
-                    flash(f"Dados importados com sucesso! {resultado['registros']} registros processados.", 'success')
+                    mensagem = (f"Dados importados com sucesso! {resultado['registros']} registros processados "
+                                f"({resultado['inseridos']} novos, {resultado['atualizados']} atualizados, "
+                                f"{resultado['ignorados']} já existentes).")
+                    if resultado['rejeitados']:
+                        mensagem += f" {resultado['rejeitados']} linhas inválidas foram descartadas."
+                    flash(mensagem, 'success')
                 else:
                     flash(f"Erro na importação: {resultado['mensagem']}", 'danger')
                 
@@ -145,27 +255,18 @@ def dashboard(fonte_id):
         return redirect(url_for('main.index'))
     
     # Verificar se existem dados reais
-    dados_reais = False
-    path_simulado = f'data/simulated/fonte_{fonte_id}_simulado.csv'
-    processed_dir = 'data/processed'
-    
-    if os.path.exists(path_simulado):
-        dados_reais = True
-    
-    if os.path.exists(processed_dir):
-        processed_files = [f for f in os.listdir(processed_dir) 
-                          if f.startswith(f'fonte_{fonte_id}_') and f.endswith('.csv')]
-        if processed_files:
-            dados_reais = True
+    dados_reais = ColumnarStore.possui_dados(fonte_id)
     
     # Métricas gerais
     metricas = DashboardController.calcular_metricas_gerais(fonte_id)
     
-    # Verificar se há alertas ativos para esta fonte
-    alertas_ativos = PerformanceMonitor.obter_alertas(fonte_id, apenas_ativos=True)
-    
-    # Realizar análise de performance
-    analise_performance = PerformanceMonitor.analisar_performance(fonte_id)
+    # Verificar se há alertas ativos para esta fonte e realizar análise de performance
+    if PERFORMANCE_MONITOR_AVAILABLE:
+        alertas_ativos = PerformanceMonitor.obter_alertas(fonte_id, apenas_ativos=True)
+        analise_performance = PerformanceMonitor.analisar_performance(fonte_id)
+    else:
+        alertas_ativos = []
+        analise_performance = {'performance_status': 'indisponível'}
     
     if not dados_reais:
         flash('Exibindo dados simulados para demonstração. Para visualizar dados reais, importe ou gere dados simulados.', 'info')
@@ -179,17 +280,85 @@ def dashboard(fonte_id):
 
 @main.route('/api/fonte/<int:fonte_id>/producao-diaria')
 def api_producao_diaria(fonte_id):
-    """API para obter dados de produção diária"""
-    dados = DashboardController.get_dados_producao_diaria(fonte_id)
-    return jsonify(dados)
+    """
+    API para obter dados de produção diária
+    
+    Parâmetros opcionais: formato=colunas ({'datas': [...], 'energia': [...]}),
+    inicio/fim (AAAA-MM-DD ou AAAA-MM-DDTHH:MM), resolucao (diaria, horaria
+    ou bruta) e max_pontos (redução da série por LTTB, no mínimo 3 pontos).
+    """
+    colunar = request.args.get('formato') == 'colunas'
+    resolucao = request.args.get('resolucao', 'diaria')
+    try:
+        inicio = ler_data_parametro('inicio')
+        fim = ler_data_parametro('fim', fim=True)
+        max_pontos = int(request.args['max_pontos']) if request.args.get('max_pontos') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parâmetros inválidos (datas AAAA-MM-DD, max_pontos inteiro)'})
+    if max_pontos is not None and max_pontos < DashboardController.MIN_PONTOS:
+        return jsonify({'success': False, 'message': f'max_pontos deve ser no mínimo {DashboardController.MIN_PONTOS}'})
+    if resolucao not in ('diaria', 'horaria', 'bruta'):
+        return jsonify({'success': False, 'message': 'Resolução inválida (diaria, horaria ou bruta)'})
+    
+    return resposta_condicional(fonte_id, lambda: DashboardController.get_dados_producao_diaria(
+        fonte_id, colunar, resolucao, inicio, fim, max_pontos))
 
 @main.route('/api/fonte/<int:fonte_id>/producao-horaria')
 def api_producao_horaria(fonte_id):
-    """API para obter dados de produção horária"""
+    """API para obter dados de produção horária (formato=colunas para {'horas': [...], 'potencia': [...]})"""
     dia = request.args.get('dia')
-    dados = DashboardController.get_dados_producao_horaria(fonte_id, dia)
+    colunar = request.args.get('formato') == 'colunas'
+    return resposta_condicional(fonte_id, lambda: DashboardController.get_dados_producao_horaria(fonte_id, dia, colunar))
+
+@main.route('/api/fonte/<int:fonte_id>/mapa-calor')
+def api_mapa_calor(fonte_id):
+    """API com a matriz dia x hora da produção (inicio/fim AAAA-MM-DD, valor=potencia ou energia)"""
+    valor = request.args.get('valor', 'potencia')
+    try:
+        inicio = ler_data_parametro('inicio')
+        fim = ler_data_parametro('fim')
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parâmetros inválidos (datas AAAA-MM-DD)'})
+    if valor not in ('potencia', 'energia'):
+        return jsonify({'success': False, 'message': 'Valor inválido (potencia ou energia)'})
+    
+    def gerar():
+        dados = DashboardController.get_mapa_calor(fonte_id, inicio, fim, valor)
+        return dados if dados is not None else {'datas': [], 'horas': [], 'valores': []}
+    
+    return resposta_condicional(fonte_id, gerar)
+
+@main.route('/api/frota/producao-diaria')
+def api_frota_producao_diaria():
+    """API para obter a produção diária somada de todas as fontes (ou das informadas)"""
+    try:
+        inicio = ler_data_parametro('inicio')
+        fim = ler_data_parametro('fim', fim=True)
+        fontes = request.args.get('fontes')
+        fonte_ids = [int(fonte_id) for fonte_id in fontes.split(',') if fonte_id.strip()] if fontes else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Parâmetros inválidos (datas AAAA-MM-DD, fontes=1,2,3)'})
+    
+    dados = DashboardController.get_producao_diaria_frota(fonte_ids, inicio, fim)
+    if dados is None:
+        return jsonify({'success': False, 'message': 'Agregação indisponível'})
     return jsonify(dados)
 
+@main.route('/api/cache/dados')
+def api_cache_dados():
+    """API com os contadores do cache de dados (hits, misses, evictions)"""
+    return jsonify(DataFrameCache.estatisticas())
+
+@main.route('/api/cache/memoria')
+def api_cache_memoria():
+    """API com a memória ocupada pelo cache de dados por fonte (detalhada por coluna)"""
+    return jsonify({str(fonte_id): dados for fonte_id, dados in DataFrameCache.relatorio_memoria().items()})
+
+@main.route('/api/clima/metricas')
+def api_clima_metricas():
+    """API com as métricas do pool de conexões HTTP do serviço meteorológico"""
+    return jsonify(WeatherService.get_http_metrics())
+
 @main.route('/home')
 def home():
     """Página inicial do sistema"""
@@ -211,6 +380,10 @@ def monitoramento(fonte_id):
         flash('Fonte de energia não encontrada!', 'danger')
         return redirect(url_for('main.home'))
     
+    if not PERFORMANCE_MONITOR_AVAILABLE:
+        flash('Monitoramento de performance indisponível.', 'warning')
+        return redirect(url_for('main.dashboard', fonte_id=fonte_id))
+    
     # Realizar análise de performance
     analise = PerformanceMonitor.analisar_performance(fonte_id)
     
@@ -234,7 +407,7 @@ def resolver_alerta(fonte_id, alerta_id):
         return redirect(url_for('main.home'))
     
     # Marcar o alerta como resolvido
-    if PerformanceMonitor.marcar_alerta_resolvido(fonte_id, alerta_id):
+    if PERFORMANCE_MONITOR_AVAILABLE and PerformanceMonitor.marcar_alerta_resolvido(fonte_id, alerta_id):
         flash('Manutenção registrada com sucesso! O monitoramento será retomado.', 'success')
     else:
         flash('Não foi possível registrar a manutenção.', 'danger')
@@ -245,11 +418,13 @@ def resolver_alerta(fonte_id, alerta_id):
 @main.route('/api/fonte/<int:fonte_id>/performance')
 def api_performance(fonte_id):
     """API para obter dados de performance para visualização em gráficos"""
-    # Realizar análise de performance
-    analise = PerformanceMonitor.analisar_performance(fonte_id)
+    if not PERFORMANCE_MONITOR_AVAILABLE:
+        return jsonify({'success': False, 'message': 'Monitoramento de performance indisponível'})
     
-    # Retornar dados no formato JSON para uso em gráficos
-    return jsonify(analise)
+    # Realizar análise de performance e retornar no formato JSON para uso em gráficos.
+    # Sem resposta condicional: a análise depende também dos alertas resolvidos e
+    # do horário atual, que não fazem parte da versão dos dados
+    return jsonify(PerformanceMonitor.analisar_performance(fonte_id))
 
 @main.route('/api/fonte/<int:fonte_id>/previsao-geracao')
 def api_previsao_geracao(fonte_id):
@@ -257,20 +432,9 @@ def api_previsao_geracao(fonte_id):
     # Verificar se é para forçar atualização
     force_refresh = request.args.get('refresh', '').lower() == 'true'
     
-    # Se for para forçar atualização, limpar previsão salva
     if force_refresh:
-        GenerationForecaster.clear_forecast(fonte_id)
-        
-    # Verificar se já existe uma previsão salva
-    forecast_dados = GenerationForecaster.get_saved_forecast(fonte_id)
-    
-    # Flag para indicar se os dados são simulados
-    is_simulated = False
-    
-    # Se não existir ou estiver desatualizada, gerar nova previsão
-    if not forecast_dados:
-        # Gerar nova previsão
-        previsoes = GenerationForecaster.predict_generation(fonte_id)
+        # Gerar nova previsão (substitui a salva; requisições simultâneas compartilham a mesma geração)
+        previsoes = GenerationForecaster.regenerate_forecast(fonte_id)
         if not previsoes:
             return jsonify({
                 'success': False,
@@ -278,27 +442,39 @@ def api_previsao_geracao(fonte_id):
                 'previsoes': []
             })
             
-        # Verificar se os dados são simulados (verificando a origem)
-        if any('simulado' in str(previsao.get('source', '')).lower() for previsao in previsoes):
-            is_simulated = True
-        
         # Formatar a resposta
         forecast_dados = {
             'fonte_id': fonte_id,
             'data_previsao': datetime.now().isoformat(),
             'previsoes': previsoes,
-            'is_simulated': is_simulated
+            'idade': 0,
+            'is_stale': False,
+            'refreshing': False
         }
     else:
-        # Verificar se os dados salvos são simulados
-        if forecast_dados.get('is_simulated', False):
-            is_simulated = True
+        # Responder com a última previsão disponível; a atualização ocorre em segundo plano
+        forecast_dados = GenerationForecaster.get_forecast_stale_while_revalidate(fonte_id)
+        if not forecast_dados:
+            return jsonify({
+                'success': False,
+                'message': 'Não foi possível gerar previsões de geração',
+                'previsoes': []
+            })
+    
+    # Verificar se os dados são simulados (verificando a origem)
+    is_simulated = forecast_dados.get('is_simulated', False) or any(
+        'simulado' in str(previsao.get('source', '')).lower() for previsao in forecast_dados['previsoes']
+    )
     
     return jsonify({
         'success': True,
         'message': 'Previsão de geração obtida com sucesso',
         'previsoes': forecast_dados['previsoes'],
-        'is_simulated': is_simulated
+        'is_simulated': is_simulated,
+        'is_stale': forecast_dados['is_stale'],
+        'refreshing': forecast_dados['refreshing'],
+        'forecast_age': forecast_dados['idade'],
+        'weather_cache_age': GenerationForecaster.get_weather_cache_age(forecast_dados['previsoes'])
     })
 
 @main.route('/fonte/<int:fonte_id>/previsao')
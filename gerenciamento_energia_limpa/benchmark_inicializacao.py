@@ -0,0 +1,137 @@
+"""
+Mede o custo de inicialização da aplicação
+
+Cada repetição roda em um processo novo (importações a frio) e mede o tempo
+de create_app() e da primeira resposta; uma execução extra com
+python -X importtime lista os módulos mais caros de importar.
+
+A medição usa a configuração padrão (variáveis de ambiente atuais); com
+--prewarm a atualização de previsões em segundo plano é ativada, como em
+um processo que a executa em produção. O módulo de monitoramento de
+performance é opcional: sem ele a aplicação inicia normalmente e apenas as
+rotas de alertas respondem como indisponíveis.
+
+Uso:
+    python benchmark_inicializacao.py
+    python benchmark_inicializacao.py --repeticoes 10 --orcamento-ms 500
+    python benchmark_inicializacao.py --prewarm
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Módulos que não deveriam ser carregados antes do primeiro uso
+MODULOS_PESADOS = ['pandas', 'numpy', 'matplotlib', 'seaborn', 'requests']
+
+CODIGO_MEDICAO = """
+import sys, time, json
+inicio = time.perf_counter()
+from app import create_app
+app = create_app()
+criado = time.perf_counter()
+resposta = app.test_client().get({rota!r})
+respondido = time.perf_counter()
+print(json.dumps({{
+    'create_app_ms': (criado - inicio) * 1000,
+    'primeira_resposta_ms': (respondido - criado) * 1000,
+    'status': resposta.status_code,
+    'forecast_prewarm': app.config.get('FORECAST_PREWARM'),
+    'modulos_carregados': [nome for nome in {modulos!r} if nome in sys.modules]
+}}))
+"""
+
+def _ambiente(prewarm=False):
+    ambiente = dict(os.environ)
+    if prewarm:
+        ambiente['FORECAST_PREWARM'] = 'true'
+    return ambiente
+
+def medir_execucao(rota, prewarm=False):
+    """Executa uma inicialização a frio e retorna as medições"""
+    codigo = CODIGO_MEDICAO.format(rota=rota, modulos=MODULOS_PESADOS)
+    processo = subprocess.run([sys.executable, '-c', codigo], cwd=DIRETORIO, env=_ambiente(prewarm),
+                              capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise RuntimeError(f"Falha ao iniciar a aplicação:\n{processo.stderr}")
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+def medir_importacoes(rota, top=15, prewarm=False):
+    """
+    Executa uma inicialização com -X importtime
+
+    Returns:
+        tuple: Tempo total de importação (ms) e a lista (módulo, acumulado, próprio)
+        dos módulos mais caros
+    """
+    codigo = CODIGO_MEDICAO.format(rota=rota, modulos=MODULOS_PESADOS)
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=DIRETORIO,
+                              env=_ambiente(prewarm), capture_output=True, text=True)
+    modulos = []
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        # O nome vem após '| '; a indentação restante indica a profundidade da importação
+        modulos.append((nome.rstrip()[1:], int(acumulado) / 1000, int(proprio) / 1000))
+
+    # Apenas módulos de nível superior (sem indentação) somam o tempo total
+    total = sum(acumulado for nome, acumulado, _ in modulos if not nome.startswith(' '))
+    modulos.sort(key=lambda modulo: modulo[1], reverse=True)
+    return total, modulos[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização da aplicação")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Inicializações a frio (padrão: 5)")
+    parser.add_argument("--rota", default="/api/cache/dados", help="Rota da primeira requisição")
+    parser.add_argument("--top", type=int, default=15, help="Quantidade de módulos no relatório de importação")
+    parser.add_argument("--orcamento-ms", type=float, help="Falha (código 1) se a mediana de create_app() passar disso")
+    parser.add_argument("--prewarm", action="store_true",
+                        help="Ativa a atualização de previsões em segundo plano (FORECAST_PREWARM=true)")
+    parser.add_argument("--json", action="store_true", help="Imprime o relatório em JSON")
+    args = parser.parse_args()
+
+    execucoes = [medir_execucao(args.rota, args.prewarm) for _ in range(args.repeticoes)]
+    total_importacoes, modulos = medir_importacoes(args.rota, args.top, args.prewarm)
+
+    relatorio = {
+        'repeticoes': args.repeticoes,
+        'forecast_prewarm': execucoes[-1]['forecast_prewarm'],
+        'create_app_ms': round(statistics.median(e['create_app_ms'] for e in execucoes), 1),
+        'create_app_ms_max': round(max(e['create_app_ms'] for e in execucoes), 1),
+        'primeira_resposta_ms': round(statistics.median(e['primeira_resposta_ms'] for e in execucoes), 1),
+        'status_primeira_resposta': execucoes[-1]['status'],
+        'modulos_pesados_carregados': execucoes[-1]['modulos_carregados'],
+        'importacoes_ms': round(total_importacoes, 1),
+        'modulos_mais_caros': [
+            {'modulo': nome.strip(), 'acumulado_ms': round(acumulado, 1), 'proprio_ms': round(proprio, 1)}
+            for nome, acumulado, proprio in modulos
+        ]
+    }
+
+    if args.json:
+        print(json.dumps(relatorio, indent=2))
+    else:
+        print("=== INICIALIZAÇÃO DA APLICAÇÃO ===")
+        print(f"Previsões em segundo plano: {'ativadas' if relatorio['forecast_prewarm'] else 'desativadas'}")
+        print(f"create_app():      {relatorio['create_app_ms']} ms (mediana de {args.repeticoes}, "
+              f"máx. {relatorio['create_app_ms_max']} ms)")
+        print(f"Primeira resposta: {relatorio['primeira_resposta_ms']} ms "
+              f"({args.rota} -> {relatorio['status_primeira_resposta']})")
+        print(f"Importações:       {relatorio['importacoes_ms']} ms")
+        print(f"Módulos pesados carregados: {', '.join(relatorio['modulos_pesados_carregados']) or 'nenhum'}")
+        print()
+        print(f"{'acumulado (ms)':>15} {'próprio (ms)':>13}  módulo")
+        for nome, acumulado, proprio in modulos:
+            print(f"{acumulado:>15.1f} {proprio:>13.1f}  {nome}")
+
+    if args.orcamento_ms is not None and relatorio['create_app_ms'] > args.orcamento_ms:
+        print(f"Orçamento excedido: {relatorio['create_app_ms']} ms > {args.orcamento_ms} ms")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,12 @@ class Config:
     GROWATT_API_URL = os.environ.get('GROWATT_API_URL', '')
     GROWATT_USERNAME = os.environ.get('GROWATT_USERNAME', '')
     GROWATT_PASSWORD = os.environ.get('GROWATT_PASSWORD', '')
+    
+    # Atualização das previsões de geração em segundo plano (intervalo em segundos).
+    # Desativada por padrão: cada processo que chama create_app() iniciaria a sua
+    # própria thread; ative em apenas um processo por implantação
+    FORECAST_PREWARM = os.environ.get('FORECAST_PREWARM', 'false').lower() == 'true'
+    FORECAST_PREWARM_INTERVAL = int(os.environ.get('FORECAST_PREWARM_INTERVAL', '900'))
 
 class DevelopmentConfig(Config):
     """Configurações de desenvolvimento"""
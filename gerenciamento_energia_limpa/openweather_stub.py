@@ -0,0 +1,265 @@
+"""
+Servidor local que substitui a API OpenWeather em testes de carga e benchmarks
+
+Atende /data/2.5/onecall, /data/2.5/weather e /geo/1.0/direct com respostas
+sintéticas (determinísticas por localização), gravadas da API real ou
+reproduzidas de uma gravação anterior, com latência, erros 5xx e respostas
+429 configuráveis.
+
+Uso:
+    python openweather_stub.py --porta 8099 --latencia-ms 150 --taxa-429 0.05
+    WEATHER_API_ROOT=http://127.0.0.1:8099 python main.py
+
+Gravação e reprodução:
+    WEATHER_API_KEY=... python openweather_stub.py --gravar data/owm_gravacao
+    python openweather_stub.py --reproduzir data/owm_gravacao
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+UPSTREAM_ROOT = "https://api.openweathermap.org"
+
+ENDPOINTS = {
+    "/data/2.5/onecall": "onecall",
+    "/data/2.5/weather": "weather",
+    "/geo/1.0/direct": "direct",
+}
+
+CONDICOES = [
+    {"id": 800, "main": "Clear", "description": "céu limpo", "icon": "01d"},
+    {"id": 801, "main": "Clouds", "description": "algumas nuvens", "icon": "02d"},
+    {"id": 803, "main": "Clouds", "description": "nuvens quebradas", "icon": "04d"},
+    {"id": 500, "main": "Rain", "description": "chuva leve", "icon": "10d"},
+]
+
+class StubConfig:
+    """Configuração do comportamento do servidor"""
+
+    def __init__(self, latencia_ms=0.0, jitter_ms=0.0, taxa_erro=0.0, taxa_429=0.0,
+                 retry_after=1, gravar=None, reproduzir=None, seed=None):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self.gravar = gravar
+        self.reproduzir = reproduzir
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.estatisticas = {"requisicoes": 0, "erros_injetados": 0, "respostas_429": 0,
+                             "reproduzidas": 0, "gravadas": 0, "sinteticas": 0,
+                             "por_endpoint": {}}
+
+    def contar(self, chave, endpoint=None):
+        with self.lock:
+            self.estatisticas[chave] += 1
+            if endpoint:
+                por_endpoint = self.estatisticas["por_endpoint"]
+                por_endpoint[endpoint] = por_endpoint.get(endpoint, 0) + 1
+
+    def sortear(self):
+        with self.lock:
+            return self.random.random(), self.random.gauss(0, 1)
+
+def _chave_gravacao(endpoint, params):
+    """Chave do arquivo de gravação (coordenadas arredondadas ou endereço)"""
+    if endpoint == "direct":
+        base = params.get("q", "").strip().lower()
+    else:
+        base = f"{float(params.get('lat', 0)):.2f}_{float(params.get('lon', 0)):.2f}"
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()[:16]
+
+def _caminho_gravacao(diretorio, endpoint, params):
+    return os.path.join(diretorio, endpoint, f"{_chave_gravacao(endpoint, params)}.json")
+
+def _rng_local(*partes):
+    """Gerador determinístico por localização/dia (respostas estáveis entre execuções)"""
+    semente = hashlib.sha1("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+    return random.Random(int(semente[:12], 16))
+
+def payload_onecall(lat, lon):
+    """Previsão diária sintética de 8 dias no formato da One Call API"""
+    hoje = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    daily = []
+    for i in range(8):
+        dia = hoje + timedelta(days=i)
+        rng = _rng_local(round(lat, 2), round(lon, 2), dia.date())
+        condicao = CONDICOES[min(int(rng.expovariate(1.0)), len(CONDICOES) - 1)]
+        nuvens = {"Clear": rng.randint(0, 10), "Clouds": rng.randint(25, 80)}.get(condicao["main"], rng.randint(60, 95))
+        temp_max = round(26 + rng.uniform(-4, 6), 1)
+        nascer = dia.replace(hour=5, minute=30) + timedelta(minutes=rng.randint(-30, 30))
+        por = dia.replace(hour=17, minute=45) + timedelta(minutes=rng.randint(-30, 30))
+        registro = {
+            "dt": int(dia.timestamp()),
+            "sunrise": int(nascer.timestamp()),
+            "sunset": int(por.timestamp()),
+            "temp": {"min": round(temp_max - rng.uniform(3, 8), 1), "max": temp_max},
+            "humidity": rng.randint(40, 90),
+            "clouds": nuvens,
+            "uvi": round({"Clear": rng.uniform(8, 11), "Clouds": rng.uniform(4, 8)}.get(condicao["main"], rng.uniform(1, 4)), 2),
+            "pop": round({"Clear": 0.0, "Clouds": rng.uniform(0, 0.3)}.get(condicao["main"], rng.uniform(0.5, 1.0)), 2),
+            "weather": [condicao],
+        }
+        if condicao["main"] == "Rain":
+            registro["rain"] = round(rng.uniform(0.5, 12.0), 2)
+        daily.append(registro)
+    return {"lat": lat, "lon": lon, "timezone": "America/Sao_Paulo", "timezone_offset": -10800, "daily": daily}
+
+def payload_weather(lat, lon):
+    """Condição atual sintética no formato da Current Weather API"""
+    rng = _rng_local(round(lat, 2), round(lon, 2), datetime.now().strftime("%Y-%m-%d %H"))
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "weather": [CONDICOES[rng.randint(0, len(CONDICOES) - 1)]],
+        "main": {"temp": round(273.15 + rng.uniform(18, 32), 2), "humidity": rng.randint(40, 90)},
+        "name": "Stub",
+        "cod": 200,
+    }
+
+def payload_direct(q):
+    """Geocoding sintético: coordenadas estáveis dentro do território brasileiro"""
+    rng = _rng_local(q.strip().lower())
+    return [{
+        "name": q.split(",")[0].strip() or "Stub",
+        "lat": round(rng.uniform(-30.0, -3.0), 4),
+        "lon": round(rng.uniform(-55.0, -35.0), 4),
+        "country": "BR",
+    }]
+
+def gerar_sintetico(endpoint, params):
+    if endpoint == "onecall":
+        return payload_onecall(float(params.get("lat", 0)), float(params.get("lon", 0)))
+    if endpoint == "weather":
+        return payload_weather(float(params.get("lat", 0)), float(params.get("lon", 0)))
+    return payload_direct(params.get("q", ""))
+
+def consultar_upstream(caminho, params):
+    """Consulta a API real (modo gravação)"""
+    url = f"{UPSTREAM_ROOT}{caminho}?{urlencode(params)}"
+    with urllib.request.urlopen(url, timeout=15) as resposta:
+        return json.loads(resposta.read().decode("utf-8"))
+
+def criar_handler(config):
+    class OpenWeatherStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, como a API real
+
+        def log_message(self, formato, *args):
+            pass
+
+        def _responder(self, status, corpo, cabecalhos=None):
+            dados = json.dumps(corpo).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/stats":
+                with config.lock:
+                    return self._responder(200, json.loads(json.dumps(config.estatisticas)))
+
+            endpoint = ENDPOINTS.get(url.path)
+            if endpoint is None:
+                return self._responder(404, {"cod": "404", "message": "Internal error"})
+
+            params = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+            config.contar("requisicoes", endpoint)
+
+            # Latência injetada
+            sorteio, ruido = config.sortear()
+            atraso = max(0.0, config.latencia_ms + ruido * config.jitter_ms) / 1000
+            if atraso:
+                time.sleep(atraso)
+
+            # Falhas injetadas
+            if sorteio < config.taxa_429:
+                config.contar("respostas_429")
+                return self._responder(429, {"cod": 429, "message": "Too many requests"},
+                                       {"Retry-After": str(config.retry_after)})
+            if sorteio < config.taxa_429 + config.taxa_erro:
+                config.contar("erros_injetados")
+                return self._responder(503, {"cod": 503, "message": "Service unavailable"})
+
+            corpo = None
+            if config.reproduzir:
+                caminho = _caminho_gravacao(config.reproduzir, endpoint, params)
+                if os.path.exists(caminho):
+                    with open(caminho, "r") as f:
+                        corpo = json.load(f)
+                    config.contar("reproduzidas")
+            elif config.gravar:
+                try:
+                    corpo = consultar_upstream(url.path, params)
+                except urllib.error.HTTPError as e:
+                    return self._responder(e.code, {"cod": e.code, "message": str(e)})
+                caminho = _caminho_gravacao(config.gravar, endpoint, params)
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                with open(caminho, "w") as f:
+                    json.dump(corpo, f)
+                config.contar("gravadas")
+
+            if corpo is None:
+                corpo = gerar_sintetico(endpoint, params)
+                config.contar("sinteticas")
+
+            return self._responder(200, corpo)
+
+    return OpenWeatherStubHandler
+
+def iniciar_servidor(host="127.0.0.1", porta=0, em_segundo_plano=True, **opcoes):
+    """
+    Inicia o servidor (porta 0 escolhe uma porta livre)
+
+    Returns:
+        ThreadingHTTPServer: Servidor; a raiz da API é http://host:server_port
+    """
+    servidor = ThreadingHTTPServer((host, porta), criar_handler(StubConfig(**opcoes)))
+    servidor.daemon_threads = True
+    if em_segundo_plano:
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local substituto da API OpenWeather")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8099)
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latência média por requisição")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Desvio padrão da latência")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas 503 (0-1)")
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração de respostas 429 (0-1)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Valor do cabeçalho Retry-After das respostas 429")
+    parser.add_argument("--seed", type=int, help="Semente do sorteio de latência e falhas")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument("--gravar", metavar="DIR", help="Encaminha para a API real e grava as respostas em DIR")
+    modo.add_argument("--reproduzir", metavar="DIR", help="Responde com as gravações de DIR (sintético se ausente)")
+    args = parser.parse_args()
+
+    servidor = iniciar_servidor(
+        args.host, args.porta, em_segundo_plano=False,
+        latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms,
+        taxa_erro=args.taxa_erro, taxa_429=args.taxa_429, retry_after=args.retry_after,
+        gravar=args.gravar, reproduzir=args.reproduzir, seed=args.seed
+    )
+    print(f"OpenWeather stub em http://{args.host}:{servidor.server_port} (WEATHER_API_ROOT)")
+    print(f"Estatísticas em http://{args.host}:{servidor.server_port}/stats")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
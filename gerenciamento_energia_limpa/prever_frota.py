@@ -0,0 +1,30 @@
+import argparse
+import json
+
+from dotenv import load_dotenv
+
+# Variáveis de ambiente (.env) antes de importar os serviços que as leem
+load_dotenv()
+
+from app.controllers.generation_forecaster import GenerationForecaster
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera a previsão de geração de todas as fontes cadastradas")
+    parser.add_argument("--dias", type=int, default=5, help="Número de dias de previsão (padrão: 5)")
+    parser.add_argument("--workers", type=int, default=8, help="Consultas simultâneas à API de clima (padrão: 8)")
+    parser.add_argument("--fontes", type=int, nargs="*", help="IDs das fontes (padrão: todas)")
+    args = parser.parse_args()
+    
+    relatorio = GenerationForecaster.predict_fleet(
+        days=args.dias,
+        max_workers=args.workers,
+        fonte_ids=args.fontes
+    )
+    
+    print("=== PREVISÃO DA FROTA ===")
+    print(json.dumps(relatorio, indent=2))
+    print(f"{relatorio['fontes']} fontes em {relatorio['localizacoes']} localizações: "
+          f"{relatorio['tempo_total_s']}s ({relatorio['fontes_por_segundo']} fontes/s)")
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,8 @@ def test_api():
     print(f"Chave carregada: {api_key[:5]}{'*' * 10} (mostrando primeiros 5 caracteres)")
     
     # Testar a chave em uma requisição simples
-    url = "https://api.openweathermap.org/data/2.5/weather"
+    api_root = os.environ.get("WEATHER_API_ROOT", "https://api.openweathermap.org").rstrip("/")
+    url = f"{api_root}/data/2.5/weather"
     params = {
         "lat": -20.8477,
         "lon": -41.1150,
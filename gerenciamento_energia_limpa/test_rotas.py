@@ -0,0 +1,38 @@
+"""
+Testes das rotas da API (python -m pytest test_rotas.py)
+"""
+import os
+
+import pytest
+
+os.environ.setdefault("FORECAST_PREWARM", "false")
+
+from app import create_app
+
+@pytest.fixture
+def client():
+    return create_app().test_client()
+
+@pytest.mark.parametrize("rota", [
+    "/api/fonte/1/mapa-calor?inicio=2025-03-01T00:00:00%2B00:00",
+    "/api/fonte/1/mapa-calor?fim=2025-03-31T00:00Z",
+    "/api/fonte/1/producao-diaria?inicio=2025-03-01T00:00:00-03:00",
+    "/api/fonte/1/producao-diaria?resolucao=horaria&fim=2025-03-02T12:00%2B01:00",
+    "/api/frota/producao-diaria?inicio=2025-03-01T00:00:00%2B00:00",
+])
+def test_data_com_fuso_horario_rejeitada(client, rota):
+    resposta = client.get(rota)
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados["success"] is False
+    assert dados["message"].startswith("Parâmetros inválidos")
+
+@pytest.mark.parametrize("rota", [
+    "/api/fonte/1/mapa-calor?inicio=2025-03-01&fim=2025-03-31",
+    "/api/fonte/1/producao-diaria?inicio=2025-03-01T06:00&fim=2025-03-31",
+])
+def test_data_sem_fuso_horario_aceita(client, rota):
+    resposta = client.get(rota)
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert not (isinstance(dados, dict) and dados.get("success") is False)
@@ -0,0 +1,130 @@
+"""
+Verifica se o cálculo vetorizado da previsão de geração continua idêntico
+ao cálculo original, feito dia a dia
+
+Gera fontes e previsões do tempo aleatórias, calcula as previsões com
+GenerationForecaster.estimar_energia/_montar_previsoes (como _prever_grupo,
+várias fontes por previsão do tempo) e compara cada registro com a
+implementação de referência abaixo. Termina com código 1 se houver diferença.
+
+Uso:
+    python verificar_previsao.py
+    python verificar_previsao.py --casos 20000 --seed 7
+"""
+import sys
+import random
+import argparse
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.controllers.generation_forecaster import GenerationForecaster
+
+# Implementação de referência (cálculo original, dia a dia)
+
+def fator_climatico_referencia(weather_data):
+    ideal = GenerationForecaster.IDEAL_CONDITIONS
+    pesos = GenerationForecaster.WEATHER_WEIGHTS
+    uvi_norm = min(weather_data['uvi'] / ideal['uvi'], 1.0)
+    clouds_norm = 1.0 - (weather_data['clouds'] / 100)
+    rain_norm = 1.0 if weather_data['rain'] == 0 else max(0.0, 1.0 - (weather_data['rain'] / 25.0))
+    pop_norm = 1.0 - (weather_data['pop'] / 100)
+    daylight_norm = min(weather_data['daylight_hours'] / ideal['daylight_hours'], 1.0)
+    fator = (
+        pesos['uvi'] * uvi_norm +
+        pesos['clouds'] * clouds_norm +
+        pesos['rain'] * rain_norm +
+        pesos['pop'] * pop_norm +
+        pesos['daylight_hours'] * daylight_norm
+    )
+    return max(0.0, min(1.0, fator))
+
+def previsao_referencia(capacidade, media_historica, forecast):
+    try:
+        capacidade = float(capacidade)
+    except (ValueError, TypeError):
+        capacidade = 5.0
+
+    previsoes = []
+    for day_forecast in forecast:
+        fator_climatico = fator_climatico_referencia(day_forecast)
+        if media_historica is None:
+            energia_estimada = round(capacidade * 4.2 * fator_climatico, 2)
+            referencia = capacidade
+        else:
+            energia_estimada = min(round(media_historica * fator_climatico, 2),
+                                   capacidade * 4.2 * fator_climatico)
+            referencia = media_historica
+        previsoes.append({
+            **day_forecast,
+            'energia_estimada': energia_estimada,
+            'fator_climatico': round(fator_climatico * 100, 1),
+            'mensagem': GenerationForecaster._gerar_mensagem(energia_estimada, fator_climatico, referencia)
+        })
+    return previsoes
+
+# Cálculo vetorizado (mesmos passos de _prever_grupo, sem histórico em disco)
+
+def previsao_vetorizada(fontes, forecast):
+    capacidades = []
+    medias = []
+    for capacidade, media_historica in fontes:
+        capacidades.append(GenerationForecaster._obter_capacidade(SimpleNamespace(capacidade=capacidade)))
+        medias.append(np.nan if media_historica is None else media_historica)
+
+    estimativa = GenerationForecaster.estimar_energia(
+        GenerationForecaster._tabela_clima(forecast),
+        np.array(capacidades)[:, None],
+        np.array(medias, dtype='float64')[:, None]
+    )
+    return [
+        GenerationForecaster._montar_previsoes(
+            forecast, estimativa, i, capacidades[i] if np.isnan(medias[i]) else medias[i])
+        for i in range(len(fontes))
+    ]
+
+def gerar_dia(rng):
+    """Condições de um dia, com valores de borda frequentes (sem chuva, céu limpo, limites)"""
+    return {
+        'date': '2026-01-01',
+        'uvi': rng.choice([0.0, 11.0, 14.0, round(rng.uniform(0, 14), 2)]),
+        'clouds': rng.choice([0, 100, rng.randint(0, 100)]),
+        'rain': rng.choice([0, 0, 25.0, round(rng.uniform(0, 40), 2)]),
+        'pop': rng.choice([0, 100, rng.randint(0, 100)]),
+        'daylight_hours': rng.choice([12.0, round(rng.uniform(9, 15), 2)]),
+    }
+
+def gerar_fonte(rng):
+    capacidade = rng.choice([round(rng.uniform(0.5, 500), 2), rng.randint(1, 50), '7.5', 'n/d', None])
+    media_historica = rng.choice([None, round(rng.uniform(0, 200), 3), rng.uniform(0, 50)])
+    return capacidade, media_historica
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a previsão vetorizada com o cálculo dia a dia")
+    parser.add_argument("--casos", type=int, default=6000, help="Quantidade de previsões de fontes (padrão: 6000)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador aleatório (padrão: 42)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    casos = 0
+    diferencas = 0
+    while casos < args.casos:
+        forecast = [gerar_dia(rng) for _ in range(rng.randint(1, 8))]
+        fontes = [gerar_fonte(rng) for _ in range(rng.randint(1, 20))]
+
+        for (capacidade, media_historica), previsoes in zip(fontes, previsao_vetorizada(fontes, forecast)):
+            esperado = previsao_referencia(capacidade, media_historica, forecast)
+            if previsoes != esperado:
+                diferencas += 1
+                if diferencas <= 5:
+                    print(f"Diferença (capacidade={capacidade!r}, media_historica={media_historica!r}):")
+                    print(f"  esperado: {esperado}")
+                    print(f"  obtido:   {previsoes}")
+            casos += 1
+
+    print(f"{casos} previsões comparadas, {diferencas} diferenças")
+    if diferencas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()